@@ -18,6 +18,16 @@ EVENT_BOT_FOOTER = "Notifying you of upcoming events!"
 # Stream Bot
 ENABLE_STREAM_BOT = True
 STREAM_BOT_NICKNAME = "G-Code Guardian"
+STREAM_LAYOUT = "messages" # "messages" (one message per camera) or "mosaic" (one grid image for all cameras)
+STREAM_MOSAIC_TILE_WIDTH = 640
+# Seconds between stream refreshes: while printing/heating, while idle/offline, and for
+# `burst_ticks` refreshes after a state change. Streams can override these with a "cadence" entry.
+STREAM_CADENCE = {"active": 3.0, "idle": 15.0, "burst": 1.0, "burst_ticks": 5}
+# Per-print timelapse: one frame per layer (or every `interval` seconds), at most `max_frames`
+# frames / `max_mb` MB on disk per stream. Streams can override with a "timelapse" entry (false = off).
+STREAM_TIMELAPSE = {"enabled": True, "interval": 60, "max_frames": 300, "max_mb": 30}
+STREAM_HEARTBEAT_SECONDS = 60 # Re-send unchanged stream messages this often so the timestamp shows the bot is alive (0 = never)
+STREAM_PUBLISHER = "bot" # "bot" (all edits share the bot's channel rate limit) or "webhook" (one webhook per stream)
 
 # Schedule Bot
 ENABLE_SCHEDULE_BOT = True
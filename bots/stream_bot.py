@@ -4,19 +4,68 @@ import aiohttp
 import os
 import json
 import logging
-import hashlib
+import shutil
+import math
+import functools
+import time
 from io import BytesIO
 import bot_config
 import sys
+from concurrent.futures import ThreadPoolExecutor
 
 # Add parent directory to path to find utils
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from utils.sdcp_client import SDCPClient
+from utils.sdcp_client import SDCPClient, discover_printers
+from utils.moonraker_client import MoonrakerClient
+from utils.mjpeg_parser import create_frame_parser
+from utils.frame_slot import FrameSlot
+from utils.camera_hub import CameraHub
+from utils.snapshot_poller import SnapshotPoller
+from utils.printer_protocol import PrinterProtocolCache, MOONRAKER, SDCP, NONE
+from utils.printer_cache import load_printer_cache, save_printer_cache
+from utils.frame_change import FrameChangeDetector
+from utils.image_tools import recompress_jpeg, compose_mosaic, render_timelapse_gif, render_contact_sheet, render_history_chart, PILLOW_AVAILABLE
+from utils.edit_scheduler import EditScheduler, PRIORITY_STATE_CHANGE, PRIORITY_ACTIVE, PRIORITY_IDLE
+from utils.cadence import CadencePolicy
+from utils.status_cache import PrinterStatusCache
+from utils.timelapse import TimelapseRecorder
+from utils.printer_history import PrinterHistory, sparkline
+from utils.eta import EtaEstimator
+from utils.stream_publisher import BotPublisher, WebhookPublisher, RenderedState, embed_state, render_fingerprint, attachment_id, edit_rendered
 
 # Setup Logging
 logger = logging.getLogger("StreamBot")
 
 CONFIG_FILE = "data/stream_config.json"
+STATE_FILE = "data/stream_state.json" # Message ID of each stream, so restarts don't scan history
+TIMELAPSE_DIR = "data/timelapse" # One frame ring buffer per stream ID
+TIMELAPSE_MAX_UPLOAD = 8 * 1024 * 1024 # Larger animations are posted as a contact sheet instead
+TIMELAPSE_FRAME_WIDTH = 480 # Frames are stored at the GIF's width, so the size cap covers the whole print
+
+# Mimic a browser to ensure stream servers wake up
+HTTP_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
+}
+
+# Text of the single message used by the mosaic layout
+MOSAIC_CONTENT = "📷 **Live Printer Cams**"
+
+# Webhooks created for stream messages are named "<prefix> <stream id>"
+WEBHOOK_NAME_PREFIX = "Printer Cam"
+UNKNOWN_WEBHOOK = 10015 # Discord error code when a webhook was deleted
+
+# Printer states that are refreshed at the slow (idle) cadence
+QUIET_STATES = ('idle', 'standby', 'error', 'offline', 'complete', 'cancelled', 'paused')
+
+# Camera modes: a continuous MJPEG stream or a still image polled once per update
+STREAM_MODES = ("stream", "snapshot")
+
+def parse_stream_mode(value):
+    """
+    Normalises a mode typed into a modal. Returns None if it isn't a known mode.
+    """
+    mode = (value or "").strip().lower() or "stream"
+    return mode if mode in STREAM_MODES else None
 
 def load_stream_config():
     if os.path.exists(CONFIG_FILE):
@@ -32,13 +81,15 @@ def load_stream_config():
         url = os.getenv(f'STREAM_{i}_URL')
         title = os.getenv(f'STREAM_{i}_TITLE', f"Stream {i}")
         printer_url = os.getenv(f'PRINTER_{i}_URL', "")
+        mode = parse_stream_mode(os.getenv(f'STREAM_{i}_MODE')) or "stream"
         
         if url:
              streams.append({
                   "id": i,
                   "title": title,
                   "url": url,
-                  "printer_url": printer_url
+                  "printer_url": printer_url,
+                  "mode": mode
              })
              
     if streams:
@@ -51,16 +102,86 @@ def save_stream_config(streams):
     os.makedirs(os.path.dirname(CONFIG_FILE), exist_ok=True)
     with open(CONFIG_FILE, 'w') as f:
         json.dump(streams, f, indent=4)
+
+def load_stream_state():
+    if os.path.exists(STATE_FILE):
+        try:
+            with open(STATE_FILE, 'r') as f:
+                return json.load(f)
+        except Exception as e:
+            logger.error(f"Failed to load stream state: {e}")
+    return {}
+
+def save_stream_state(state):
+    try:
+        os.makedirs(os.path.dirname(STATE_FILE), exist_ok=True)
+        with open(STATE_FILE, 'w') as f:
+            json.dump(state, f, indent=4)
+    except Exception as e:
+        logger.error(f"Failed to save stream state: {e}")
+
+def format_band(seconds):
+    """
+    Formats an ETA uncertainty compactly, e.g. "4m" or "1h05m".
+    """
+    minutes = max(1, round(seconds / 60))
+    if minutes < 60:
+        return f"{minutes}m"
+    return f"{minutes // 60}h{minutes % 60:02d}m"
+
+def parse_history_query(text, find_stream, default_hours=4.0, max_hours=4.0):
+    """
+    Splits "<stream name or ID> [hours]" into (stream, hours). The whole text is tried
+    as a stream first, so names ending in a number (e.g. "Printer 1") still match.
+    Returns (None, hours) if no stream matches.
+    """
+    words = text.split()
+    if not words:
+        return None, default_hours
+
+    stream = find_stream(" ".join(words))
+    if stream or len(words) < 2:
+        return stream, default_hours
+
+    try:
+        hours = float(words[-1])
+    except ValueError:
+        return None, default_hours
+    if not math.isfinite(hours):
+        # "nan" or "inf" isn't a window; the full text already failed as a name
+        return None, default_hours
+    return find_stream(" ".join(words[:-1])), min(max(hours, 0.1), max_hours)
+
+def footer_stream_id(message):
+    """
+    Returns the stream ID from the "... • ID: <id>" footer of a stream message, or None.
+    """
+    if not message.embeds or message.content == MOSAIC_CONTENT:
+        return None
+    footer_text = message.embeds[0].footer.text or ""
+    if "ID: " not in footer_text:
+        return None
+    try:
+        return int(footer_text.rsplit("ID: ", 1)[1])
+    except ValueError:
+        return None
+
 class AddStreamModal(discord.ui.Modal, title="Add New Stream"):
     title_inp = discord.ui.TextInput(label="Stream Name", placeholder="e.g. Printer 1", max_length=50)
-    url_inp = discord.ui.TextInput(label="Camera MJPEG URL", placeholder="http://...", style=discord.TextStyle.short)
+    url_inp = discord.ui.TextInput(label="Camera URL (MJPEG or Snapshot)", placeholder="http://...", style=discord.TextStyle.short)
     printer_url_inp = discord.ui.TextInput(label="Printer API URL", placeholder="Optional (http://...:7125)", required=False)
+    mode_inp = discord.ui.TextInput(label="Mode (stream / snapshot)", placeholder="stream", required=False, max_length=10)
 
     def __init__(self, bot):
         super().__init__()
         self.bot = bot
 
     async def on_submit(self, interaction: discord.Interaction):
+        mode = parse_stream_mode(self.mode_inp.value)
+        if not mode:
+            await interaction.response.send_message("❌ Mode must be `stream` or `snapshot`.", ephemeral=True)
+            return
+
         streams = load_stream_config()
         new_id = 1
         if streams:
@@ -70,17 +191,19 @@ class AddStreamModal(discord.ui.Modal, title="Add New Stream"):
             "id": new_id,
             "title": self.title_inp.value,
             "url": self.url_inp.value,
-            "printer_url": self.printer_url_inp.value
+            "printer_url": self.printer_url_inp.value,
+            "mode": mode
         })
         save_stream_config(streams)
         
-        await interaction.response.send_message(f"✅ Added Stream: {self.title_inp.value}. Restarting...", ephemeral=True)
-        await self.bot.purge_and_restart()
+        await interaction.response.send_message(f"✅ Added Stream: {self.title_inp.value}. Starting...", ephemeral=True)
+        await self.bot.start_streams()
 
 class EditStreamModal(discord.ui.Modal, title="Edit Stream"):
     title_inp = discord.ui.TextInput(label="Stream Name", max_length=50)
-    url_inp = discord.ui.TextInput(label="Camera MJPEG URL", style=discord.TextStyle.short)
+    url_inp = discord.ui.TextInput(label="Camera URL (MJPEG or Snapshot)", style=discord.TextStyle.short)
     printer_url_inp = discord.ui.TextInput(label="Printer API URL", required=False)
+    mode_inp = discord.ui.TextInput(label="Mode (stream / snapshot)", required=False, max_length=10)
 
     def __init__(self, bot, stream_params):
         super().__init__()
@@ -90,19 +213,26 @@ class EditStreamModal(discord.ui.Modal, title="Edit Stream"):
         self.title_inp.default = stream_params.get('title', '')
         self.url_inp.default = stream_params.get('url', '')
         self.printer_url_inp.default = stream_params.get('printer_url', '')
+        self.mode_inp.default = stream_params.get('mode', 'stream')
 
     async def on_submit(self, interaction: discord.Interaction):
+        mode = parse_stream_mode(self.mode_inp.value)
+        if not mode:
+            await interaction.response.send_message("❌ Mode must be `stream` or `snapshot`.", ephemeral=True)
+            return
+
         streams = load_stream_config()
         for s in streams:
             if s['id'] == self.stream_id:
                 s['title'] = self.title_inp.value
                 s['url'] = self.url_inp.value
                 s['printer_url'] = self.printer_url_inp.value
+                s['mode'] = mode
                 break
         
         save_stream_config(streams)
-        await interaction.response.send_message(f"✅ Edited Stream {self.stream_id}. Restarting...", ephemeral=True)
-        await self.bot.purge_and_restart()
+        await interaction.response.send_message(f"✅ Edited Stream {self.stream_id}. Applying...", ephemeral=True)
+        await self.bot.start_streams()
 
 class EditStreamSelect(discord.ui.Select):
     def __init__(self, bot):
@@ -159,11 +289,36 @@ class DeleteStreamSelect(discord.ui.Select):
         
         if len(streams) < original_len:
             save_stream_config(streams)
-            await interaction.response.send_message("✅ Deleted stream. Restarting...", ephemeral=True)
-            await self.bot.purge_and_restart()
+            await interaction.response.send_message("✅ Deleted stream.", ephemeral=True)
+            await self.bot.start_streams()
         else:
             await interaction.response.send_message("❌ Stream not found.", ephemeral=True)
 
+class SnapshotStreamSelect(discord.ui.Select):
+    def __init__(self, bot):
+        self.bot = bot
+        options = []
+        for stream in bot.running_streams():
+            lbl = stream.get('title', f"Stream {stream['id']}")
+            options.append(discord.SelectOption(label=lbl, value=str(stream['id']), emoji="📷"))
+            if len(options) >= 25: break
+
+        if not options:
+            options.append(discord.SelectOption(label="No streams running", value="none"))
+
+        super().__init__(placeholder="Select stream to snapshot...", options=options)
+
+    async def callback(self, interaction: discord.Interaction):
+        if self.values[0] == "none":
+            await interaction.response.send_message("No streams are running.", ephemeral=True)
+            return
+
+        stream = self.bot.find_running_stream(self.values[0])
+        if not stream:
+            await interaction.response.send_message("❌ Stream not found.", ephemeral=True)
+            return
+        await interaction.response.send_message(ephemeral=True, **self.bot.build_snapshot(stream))
+
 class StreamAdminView(discord.ui.View):
     def __init__(self, bot: 'StreamBot'):
         super().__init__(timeout=None)
@@ -196,18 +351,99 @@ class StreamAdminView(discord.ui.View):
         view.add_item(DeleteStreamSelect(self.bot))
         await interaction.response.send_message("Select stream to delete:", view=view, ephemeral=True)
 
+    @discord.ui.button(label="Printer Protocols", style=discord.ButtonStyle.secondary, custom_id="stream_admin_protocols")
+    async def protocols_btn(self, interaction: discord.Interaction, button: discord.ui.Button):
+        if not interaction.user.guild_permissions.administrator: return
+        await interaction.response.send_message(embed=self.bot.get_protocol_embed(), ephemeral=True)
+
+    @discord.ui.button(label="Snapshot", style=discord.ButtonStyle.secondary, custom_id="stream_admin_snapshot")
+    async def snapshot_btn(self, interaction: discord.Interaction, button: discord.ui.Button):
+        if not interaction.user.guild_permissions.administrator: return
+        view = discord.ui.View()
+        view.add_item(SnapshotStreamSelect(self.bot))
+        await interaction.response.send_message("Select stream to snapshot:", view=view, ephemeral=True)
+
+    @discord.ui.button(label="Upload Stats", style=discord.ButtonStyle.secondary, custom_id="stream_admin_upload_stats")
+    async def upload_stats_btn(self, interaction: discord.Interaction, button: discord.ui.Button):
+        if not interaction.user.guild_permissions.administrator: return
+        await interaction.response.send_message(embed=self.bot.get_upload_stats_embed(), ephemeral=True)
+
 class StreamBot(discord.Client):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        self.stream_tasks = []
+        self.stream_tasks = {} # Stream ID (or "mosaic") -> (task, stream config it runs with)
+        self.stream_messages = {} # Stream ID -> its current Discord message
+        self.message_ids = {} # str(Stream ID) or "mosaic" -> message ID, saved to STATE_FILE
+        self.streams_lock = asyncio.Lock() # Serialises reloads from concurrent admin actions
         self.channel_id = None
         self.update_interval = 3.0 # Seconds
         self.has_started = False
-        self.sdcp_clients = {} # Cache clients per URL/IP
+        self.sdcp_clients = {} # Connected clients per IP, only while a stream shows the printer
+        self.sdcp_identities = {} # IP -> {'mainboard_id', 'attributes'}, kept after its client is closed
+        self.moonraker_clients = {} # Subscribed Moonraker clients per printer URL
+        self.http_session = None # Shared by all cameras and printer queries
+        # One upstream MJPEG connection per camera URL, shared by every stream showing it
+        self.camera_hub = CameraHub(lambda url, slot: self.camera_reader(self.http_session, url, slot))
+        self.printer_protocols = PrinterProtocolCache()
+        self.detect_locks = {} # Host -> lock, so each host is only probed once at a time
+        # One status poller per printer; streams only read the cached result
+        self.printer_status = PrinterStatusCache(
+            lambda printer_url: self.fetch_printer_status(self.http_session, printer_url),
+            interval=self.update_interval,
+            on_status=self.on_printer_status,
+            on_release=lambda printer_url: asyncio.create_task(self.release_printer_clients(printer_url))
+        )
+        self.printer_history = {} # Printer URL -> PrinterHistory (last few hours of temps/progress)
+        self.printer_eta = {} # Printer URL -> EtaEstimator fed by every status (Moonraker and SDCP)
+        self.stream_printers = {} # Stream ID -> printer URL it shows
+        # Image decoding/encoding runs here so the event loop never does image work
+        self.image_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="stream-image")
+        self.stream_stats = {} # Upload sizes per stream ID
+        self.stream_slots = {} # Stream ID -> FrameSlot with its newest frame
+        self.snapshot_cache = {} # Stream ID -> (frame seq, JPEG bytes) last handed out
+        # All streams share the channel's edit rate limit
+        self.edit_scheduler = EditScheduler()
+
+        # Mosaic layout: one grid image for all cameras instead of a message per camera
+        self.layout = bot_config.STREAM_LAYOUT
+        if self.layout == "mosaic" and not PILLOW_AVAILABLE:
+            logger.error("Mosaic layout needs Pillow, falling back to one message per stream.")
+            self.layout = "messages"
+        self.mosaic_sources = {} # Stream ID -> {'title', 'slot', 'embed'}
+
+        # Webhook publisher: each stream posts through its own webhook (own rate limit)
+        self.channel_webhooks = None # Fetched once, then reused by every stream
+        self.webhook_lock = asyncio.Lock()
 
     async def setup_hook(self):
+        # One pooled session for the whole bot: keep-alive connections are reused
+        # across ticks and each camera/printer host gets a bounded number of sockets
+        connector = aiohttp.TCPConnector(limit=32, limit_per_host=4, keepalive_timeout=60)
+        self.http_session = aiohttp.ClientSession(connector=connector, headers=HTTP_HEADERS)
+        # Known printers from the last run can show status without rediscovery
+        self.restore_printer_cache()
+        self.message_ids = load_stream_state()
+        self.edit_scheduler.start()
         self.add_view(StreamAdminView(self))
 
+    async def close(self):
+        await self.stop_all_streams()
+        await self.camera_hub.close()
+        await self.edit_scheduler.stop()
+        await self.printer_status.close()
+
+        for client in self.sdcp_clients.values():
+            await client.close()
+        self.sdcp_clients = {}
+        for client in self.moonraker_clients.values():
+            await client.close()
+        self.moonraker_clients = {}
+
+        if self.http_session and not self.http_session.closed:
+            await self.http_session.close()
+        self.image_pool.shutdown(wait=False)
+        await super().close()
+
     async def on_ready(self):
         logger.info(f"StreamBot logged in as {self.user}")
         
@@ -231,36 +467,131 @@ class StreamBot(discord.Client):
             except Exception as e:
                 logger.error(f"Failed to change nickname in {guild.name}: {e}")
 
+        # Find SDCP printers with one broadcast instead of probing each host
+        await self.discover_sdcp_printers()
+
         # Start streams
         await self.start_streams()
         self.has_started = True
 
     async def start_streams(self):
-        # Cancel existing tasks if any
-        for task in self.stream_tasks:
-            task.cancel()
-        self.stream_tasks = []
+        """
+        Brings the running streams in line with the config: new streams are started,
+        deleted ones stopped (and their message removed) and edited ones restarted.
+        Unchanged streams keep running and keep their messages.
+        """
+        async with self.streams_lock:
+            await self._start_streams()
 
+    async def _start_streams(self):
+        # Caller holds streams_lock
         channel = self.get_channel(self.channel_id)
         if not channel:
             logger.error(f"Stream Channel ID {self.channel_id} not found.")
             return
 
-        # Start streams from config
-        streams = load_stream_config()
-        for stream in streams:
-            url = stream.get('url')
-            title = stream.get('title', f"Stream {stream.get('id')}")
-            index = stream.get('id')
-            p_url = stream.get('printer_url', "")
-            
-            if url:
-                print(f"Starting stream {index}: {title}")
-                task = self.loop.create_task(self.stream_loop(channel, url, title, index, p_url))
-                self.stream_tasks.append(task)
+        streams = {s.get('id'): s for s in load_stream_config() if s.get('url')}
+
+        for stream_id, (task, running) in list(self.stream_tasks.items()):
+            if stream_id == "mosaic":
+                continue
+            if streams.get(stream_id) != running or task.done():
+                await self.stop_stream(stream_id, remove_message=stream_id not in streams)
+
+        new_ids = [stream_id for stream_id in streams if stream_id not in self.stream_tasks]
+        found = {}
+        if new_ids and self.layout != "mosaic":
+            found = await self.resolve_stream_messages(channel, new_ids)
+
+        for stream_id in new_ids:
+            stream = streams[stream_id]
+            print(f"Starting stream {stream_id}: {stream.get('title')} ({stream.get('mode', 'stream')})")
+            task = self.loop.create_task(self.stream_loop(channel, stream, found.get(stream_id)))
+            self.stream_tasks[stream_id] = (task, stream)
+
+        if self.layout == "mosaic" and "mosaic" not in self.stream_tasks:
+            self.stream_tasks["mosaic"] = (self.loop.create_task(self.mosaic_loop(channel)), None)
+
+    async def stop_stream(self, stream_id, remove_message=False):
+        """
+        Stops one stream and waits for it to clean up. Optionally deletes its message.
+        """
+        task, _ = self.stream_tasks.pop(stream_id, (None, None))
+        if task:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+        message = self.stream_messages.pop(stream_id, None)
+        if remove_message:
+            if self.message_ids.pop(str(stream_id), None):
+                save_stream_state(self.message_ids)
+            await asyncio.get_running_loop().run_in_executor(
+                self.image_pool,
+                functools.partial(shutil.rmtree, os.path.join(TIMELAPSE_DIR, str(stream_id)), ignore_errors=True)
+            )
+            if message:
+                try:
+                    await message.delete()
+                except discord.HTTPException as e:
+                    logger.error(f"Failed to delete message of stream {stream_id}: {e}")
+
+    async def resolve_stream_messages(self, channel, stream_ids):
+        """
+        Looks up the existing messages of the given streams. Remembered message IDs
+        are fetched directly; all other streams share a single history scan.
+        Returns {stream ID: message}.
+        """
+        found = {}
+        for stream_id in stream_ids:
+            message_id = self.message_ids.get(str(stream_id))
+            if not message_id:
+                continue
+            try:
+                found[stream_id] = await channel.fetch_message(message_id)
+            except discord.NotFound:
+                pass
+            except discord.HTTPException as e:
+                logger.error(f"Failed to fetch message of stream {stream_id}: {e}")
+
+        missing = set(stream_ids) - set(found)
+        if missing:
+            try:
+                async for history_msg in channel.history(limit=100):
+                    # Bot messages, or webhook messages when the webhook publisher is used
+                    if history_msg.author != self.user and history_msg.webhook_id is None:
+                        continue
+                    stream_id = footer_stream_id(history_msg)
+                    if stream_id in missing:
+                        found[stream_id] = history_msg
+                        missing.discard(stream_id)
+                        if not missing:
+                            break
+            except discord.HTTPException as e:
+                logger.error(f"Failed to scan stream channel history: {e}")
+        return found
+
+    def remember_stream_message(self, stream_id, message):
+        """
+        Tracks a stream's current message and saves its ID when it changed.
+        """
+        self.stream_messages[stream_id] = message
+        if message and self.message_ids.get(str(stream_id)) != message.id:
+            self.message_ids[str(stream_id)] = message.id
+            save_stream_state(self.message_ids)
+
+    async def stop_all_streams(self):
+        tasks = [task for task, _ in self.stream_tasks.values()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self.stream_tasks = {}
+        self.stream_messages = {}
 
     async def get_frame(self, session, url):
-        buffer = b""
+        """
+        Yields JPEG frames from an MJPEG stream (None when the stream is down).
+        Frames are memoryviews that are only valid until the next frame is requested.
+        """
         try:
             # Add timeout for connection and read
             timeout = aiohttp.ClientTimeout(total=None, connect=10, sock_read=10)
@@ -271,24 +602,11 @@ class StreamBot(discord.Client):
                     await asyncio.sleep(5)
                     return
 
-                async for chunk in response.content.iter_chunked(4096):
-                    buffer += chunk
-                    
-                    while True:
-                        a = buffer.find(b'\xff\xd8')
-                        b = buffer.find(b'\xff\xd9')
-                        
-                        if a != -1 and b != -1:
-                            if a < b:
-                                yield buffer[a:b+2]
-                                buffer = buffer[b+2:]
-                            else:
-                                buffer = buffer[a:]
-                        else:
-                            break
-                        
-                    if len(buffer) > 5 * 1024 * 1024:
-                         buffer = b""
+                # Split on the multipart boundary when the server announces one
+                parser = create_frame_parser(response.headers.get('Content-Type'))
+                async for chunk in response.content.iter_any():
+                    for frame in parser.feed(chunk):
+                        yield frame
                              
         except (asyncio.TimeoutError, aiohttp.ClientError) as e:
             logger.error(f"Stream connection/read error {url}: {e}")
@@ -299,199 +617,836 @@ class StreamBot(discord.Client):
             yield None
             await asyncio.sleep(5)
 
-    async def stream_loop(self, channel, url, title, index, config_printer_url=""):
-        message = None
-        last_status = "CONNECTING" 
+    async def stream_loop(self, channel, stream, message=None):
+        url = stream.get('url')
+        title = stream.get('title', f"Stream {stream.get('id')}")
+        index = stream.get('id')
+        config_printer_url = stream.get('printer_url', "")
+        mode = stream.get('mode', "stream")
+
+        # In mosaic mode this loop only keeps the embed up to date; mosaic_loop publishes it
+        mosaic = self.layout == "mosaic"
         
         # Initial Embed
         embed = discord.Embed(title=title, color=0xF1C40F) # Yellow for connecting
         embed.set_footer(text=f"Status: CONNECTING • ID: {index}")
         
-        # Try to find existing message
+        publisher = None
+        if not mosaic:
+            publisher = await self.get_publisher(channel, index, title)
+            message = await self.find_stream_message(channel, index, embed, publisher, message)
+            self.remember_stream_message(index, message)
+
+        session = self.http_session
+        # The hub's reader keeps only the newest frame; we sample it once per tick.
+        # Snapshot cameras are polled on the tick itself instead.
+        poller = None
+        if mode == "snapshot":
+            slot = FrameSlot()
+            poller = SnapshotPoller(url)
+        else:
+            slot = self.camera_hub.subscribe(url)
+        seen_version = slot.state_version
+
+        # Only upload a new image when the scene visibly changed (or the refresh is due)
+        change_detector = FrameChangeDetector(
+            threshold=float(stream.get('change_threshold', 1.0)),
+            refresh_interval=float(stream.get('refresh_minutes', 5)) * 60,
+            executor=self.image_pool
+        )
+
+        self.stream_slots[index] = slot
+        timelapse = await self.create_timelapse(stream)
+        if mosaic:
+            self.mosaic_sources[index] = {'title': title, 'slot': slot, 'embed': embed}
+
+        printer_url = config_printer_url
+        if not printer_url and url:
+            # Try to guess from stream URL
+            try:
+                from urllib.parse import urlparse
+                parsed = urlparse(url)
+                if parsed.netloc:
+                    # Default Moonraker port
+                    host = parsed.netloc.split(':')[0]
+                    printer_url = f"http://{host}:7125"
+            except:
+                pass
+        if printer_url:
+            self.printer_status.watch(printer_url)
+            self.stream_printers[index] = printer_url
+
+        # Refresh interval follows the printer state (fast while working, slow while idle)
+        cadence = CadencePolicy.from_config(bot_config.STREAM_CADENCE, stream.get('cadence'))
+
+        backoff = 1
+        force_update = poller is not None
+        last_seq = None
+        last_status = None
+        last_state = None
+        filename_toggle = False
+
+        # State for the next scheduled edit. The scheduler runs publish() when the
+        # channel has budget, so it always sends the newest embed and image.
+        pending_image = None  # (jpeg bytes, filename)
+        clear_image = False
+        # What the message showed after its last edit, so identical edits are skipped
+        rendered = RenderedState(heartbeat=bot_config.STREAM_HEARTBEAT_SECONDS)
+
+        def edit_needed():
+            if not message or pending_image:
+                return True
+            if clear_image and message.attachments:
+                return True
+            return rendered.needs_edit(render_fingerprint(embed_state([embed]), attachment_id(message)))
+
+        async def publish():
+            nonlocal message, pending_image, clear_image, last_seq, publisher
+            if not edit_needed():
+                return
+            image, clear = pending_image, clear_image
+            pending_image = None
+            clear_image = False
+            try:
+                if not message:
+                    message = await publisher.send(embed=embed)
+
+                # Footer shows when the message was last edited
+                embed.timestamp = discord.utils.utcnow()
+                if image:
+                    data, filename = image
+                    file = discord.File(BytesIO(data), filename=filename)
+                    message = await edit_rendered(message, rendered, [embed], attachments=[file])
+                elif clear and message.attachments:
+                    message = await edit_rendered(message, rendered, [embed], attachments=[])
+                else:
+                    # Image hasn't changed, just update text
+                    message = await edit_rendered(message, rendered, [embed])
+                self.remember_stream_message(index, message)
+
+            except discord.NotFound as e:
+                if isinstance(publisher, WebhookPublisher) and e.code == UNKNOWN_WEBHOOK:
+                    # The webhook was deleted in Discord; its message can only be replaced
+                    logger.warning(f"Webhook of stream {index} was deleted, setting up a new one")
+                    self.forget_webhook(publisher.webhook)
+                    stale = publisher
+                    publisher = await self.get_publisher(channel, index, title)
+                    if message:
+                        try:
+                            await channel.get_partial_message(message.id).delete()
+                        except discord.HTTPException:
+                            pass
+                    # We are running inside the stale publisher's scheduler, so stop it afterwards
+                    asyncio.create_task(stale.close())
+                # Message was deleted, recreate it and re-upload the image next tick
+                message = None
+                last_seq = None
+                change_detector.reset()
+                rendered.reset()
+            except Exception as e:
+                logger.error(f"Discord update error for {title}: {e}")
+                # The image may not have been uploaded, don't treat it as the reference
+                change_detector.reset()
+                rendered.reset()
+
         try:
-            async for history_msg in channel.history(limit=20):
-                if history_msg.author == self.user and history_msg.embeds:
-                    # Check footer to match Stream ID
-                    footer_text = history_msg.embeds[0].footer.text
-                    if footer_text and f"ID: {index}" in footer_text:
-                        message = history_msg
-                        # Update it to Connecting state
-                        await message.edit(embed=embed)
-                        break
-                        
-            if not message:
-                 message = await channel.send(embed=embed)
-        except Exception as e:
-             logger.error(f"Failed to find/send initial message for {title}: {e}")
-
-        # Mimic a browser to ensure the stream server wakes up
-        headers = {
-            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
-        }
-
-        async with aiohttp.ClientSession(headers=headers) as session:
-            backoff = 1
-            last_update = 0
-            last_image_hash = None
-            filename_toggle = False
-            
             while not self.is_closed():
+                # Wake up on the next tick, or right away when the camera goes online/offline
+                if not force_update:
+                    if poller:
+                        await asyncio.sleep(cadence.interval)
+                    else:
+                        await slot.wait_for_state_change(cadence.interval, seen_version)
+                        seen_version = slot.state_version
+                force_update = False
+
+                if poller:
+                    await poller.poll(session, slot)
+
+                if slot.online is None:
+                    # Still connecting, keep the CONNECTING embed
+                    continue
+
                 try:
-                    async for jpg_data in self.get_frame(session, url):
-                        now = asyncio.get_running_loop().time()
-                        
-                        # Determine current status and color
-                        if jpg_data is None:
-                            current_status = "OFFLINE"
-                            color = 0xE74C3C # Red
-                        else:
-                            current_status = "LIVE"
-                            color = 0x2ECC71 # Green
-
-                        # Force update if status changed or time interval passed
-                        if (now - last_update >= self.update_interval) or (current_status != last_status):
-                            
-                            # Fetch Printer Stats
-                            printer_url = config_printer_url
-                            if not printer_url and url:
-                                # Try to guess from stream URL
-                                try:
-                                    from urllib.parse import urlparse
-                                    parsed = urlparse(url)
-                                    if parsed.netloc:
-                                        # Default Moonraker port
-                                        host = parsed.netloc.split(':')[0]
-                                        printer_url = f"http://{host}:7125"
-                                except:
-                                    pass
-
-                            print_stats = {}
-                            if printer_url:
-                                print_stats = await self.fetch_printer_status(session, printer_url)
-
-                            embed.color = color
-                            
-                            # Update Footer to just ID and basic status
-                            embed.set_footer(text=f"Camera: {current_status} • ID: {index}")
+                    # Determine current status and color
+                    if not slot.online:
+                        current_status = "OFFLINE"
+                        color = 0xE74C3C # Red
+                    else:
+                        current_status = "LIVE"
+                        color = 0x2ECC71 # Green
 
-                            # Build Description with Print Details
-                            # Use placeholders if data is missing or state is not printing
-                            
-                            p_state_raw = print_stats.get('state', 'Idle')
-                            p_state = p_state_raw.title()
-                            p_file = print_stats.get('filename', '--')
-                            p_progress = print_stats.get('progress', 0) * 100
-                            
-                            # Calculate Time Left / Elapsed
-                            p_elapsed = "--"
-                            p_left = "--"
-                            
-                            # Show stats for any active state (Printing, Heating, Starting, etc)
-                            # Exclude Idle, Paused (maybe?), Error
-                            inactive_states = ['Idle', 'Standby', 'Error', 'Offline']
-                            
-                            # Check if state implies activity. 
-                            # We use lower() for comparison but p_state is Title Cased for display
-                            if p_state_raw.lower() not in [s.lower() for s in inactive_states] and p_state_raw.lower() != 'paused':
-                                if print_stats.get('print_duration') is not None:
-                                    import datetime
-                                    p_elapsed = str(datetime.timedelta(seconds=int(print_stats['print_duration'])))
-                                    
-                                    # Estimate Time Left
-                                    # Priority 1: Use Total Duration from SDCP/Moonraker if available
-                                    if print_stats.get('total_duration', 0) > 0:
-                                        left = print_stats['total_duration'] - print_stats['print_duration']
-                                        if left < 0: left = 0
-                                        p_left = str(datetime.timedelta(seconds=int(left)))
-                                    # Priority 2: Estimate based on progress
-                                    elif print_stats.get('progress', 0) > 0:
-                                        total_time = print_stats['print_duration'] / print_stats['progress']
-                                        left = total_time - print_stats['print_duration']
-                                        p_left = str(datetime.timedelta(seconds=int(left)))
-
-                            # Format Description
-                            description = f"**Status:** {p_state}\n"
-                            
-                            # Add Temperatures if available
-                            if 'temps' in print_stats:
-                                temps = print_stats['temps']
-                                # Bed: Curr / Target
-                                t_str = []
-                                if temps.get('bed'):
-                                    b_curr, b_target = temps['bed']
-                                    t_str.append(f"Bed: {float(b_curr):.1f}°C / {float(b_target):.1f}°C")
-                                if temps.get('nozzle'):
-                                    n_curr, n_target = temps['nozzle']
-                                    t_str.append(f"Noz: {float(n_curr):.1f}°C / {float(n_target):.1f}°C")
-                                if temps.get('chamber'):
-                                    c_curr = temps['chamber']
-                                    try:
-                                        t_str.append(f"Chamber: {float(c_curr):.1f}°C")
-                                    except (ValueError, TypeError):
-                                        pass
-                                
-                                if t_str:
-                                    description += f"**Temps:** {' | '.join(t_str)}\n"
-
-                            description += f"**File:** {p_file}\n"
+                    # Printer stats come from the status collector, never from the network here
+                    print_stats = {}
+                    if printer_url:
+                        print_stats = self.printer_status.get(printer_url)
+
+                    embed.color = color
+
+                    # Build Description with Print Details
+                    # Use placeholders if data is missing or state is not printing
+                    
+                    p_state_raw = print_stats.get('state', 'Idle')
+                    p_state = p_state_raw.title()
+                    p_file = print_stats.get('filename', '--')
+                    p_progress = print_stats.get('progress', 0) * 100
+                    
+                    # Calculate Time Left / Elapsed
+                    p_elapsed = "--"
+                    p_left = "--"
+                    
+                    # Show stats for any active state (Printing, Heating, Starting, etc)
+                    # Exclude Idle, Paused (maybe?), Error
+                    inactive_states = ['Idle', 'Standby', 'Error', 'Offline']
+                    
+                    # Check if state implies activity. 
+                    # We use lower() for comparison but p_state is Title Cased for display
+                    if p_state_raw.lower() not in [s.lower() for s in inactive_states] and p_state_raw.lower() != 'paused':
+                        if print_stats.get('print_duration') is not None:
+                            import datetime
+                            p_elapsed = str(datetime.timedelta(seconds=int(print_stats['print_duration'])))
                             
-                            # Only show progress/times if NOT Idle
-                            if p_state_raw != "Idle":
-                                description += (
-                                    f"**Progress:** {p_progress:.1f}%\n"
-                                    f"**Elapsed:** {p_elapsed}\n"
-                                    f"**Time Left:** {p_left}"
-                                )
-                            else:
-                                # Optional: You could show just an empty line or nothing
+                            # Estimate Time Left
+                            # Priority 1: Use Total Duration from SDCP/Moonraker if available
+                            if print_stats.get('total_duration', 0) > 0:
+                                left = print_stats['total_duration'] - print_stats['print_duration']
+                                if left < 0: left = 0
+                                p_left = str(datetime.timedelta(seconds=int(left)))
+                            # Priority 2: Fit of recent progress over time
+                            elif print_stats.get('progress', 0) > 0:
+                                eta = self.printer_eta.get(printer_url)
+                                estimate = eta.estimate(time.monotonic()) if eta else None
+                                if estimate:
+                                    left, band = estimate
+                                    p_left = str(datetime.timedelta(seconds=int(left)))
+                                    if band:
+                                        p_left += f" (± {format_band(band)})"
+                                else:
+                                    p_left = "Estimating..."
+
+                    # Format Description
+                    description = f"**Status:** {p_state}\n"
+                    
+                    # Add Temperatures if available
+                    if 'temps' in print_stats:
+                        temps = print_stats['temps']
+                        # Bed: Curr / Target
+                        t_str = []
+                        if temps.get('bed'):
+                            b_curr, b_target = temps['bed']
+                            t_str.append(f"Bed: {float(b_curr):.1f}°C / {float(b_target):.1f}°C")
+                        if temps.get('nozzle'):
+                            n_curr, n_target = temps['nozzle']
+                            t_str.append(f"Noz: {float(n_curr):.1f}°C / {float(n_target):.1f}°C")
+                        if temps.get('chamber'):
+                            c_curr = temps['chamber']
+                            try:
+                                t_str.append(f"Chamber: {float(c_curr):.1f}°C")
+                            except (ValueError, TypeError):
                                 pass
+                        
+                        if t_str:
+                            description += f"**Temps:** {' | '.join(t_str)}\n"
+
+                    description += f"**File:** {p_file}\n"
+                    
+                    # Only show progress/times if NOT Idle
+                    if p_state_raw != "Idle":
+                        description += (
+                            f"**Progress:** {p_progress:.1f}%\n"
+                            f"**Elapsed:** {p_elapsed}\n"
+                            f"**Time Left:** {p_left}"
+                        )
+                    else:
+                        # Optional: You could show just an empty line or nothing
+                        pass
 
-                            embed.description = description
+                    embed.description = description
+
+                    if timelapse:
+                        await self.update_timelapse(channel, title, timelapse, slot, print_stats)
+
+                    # Any state change bursts, then settle on the active or idle interval
+                    cadence.observe((current_status, p_state_raw), p_state_raw.lower() not in QUIET_STATES)
+
+                    # Update Footer to just ID, basic status and refresh rate
+                    embed.set_footer(text=f"Camera: {current_status} • Every {cadence.describe()} • ID: {index}")
+
+                    if mosaic:
+                        backoff = 1
+                        continue
+                    
+                    # Status changes jump the queue, working printers beat idle ones
+                    if current_status != last_status or p_state_raw != last_state:
+                        priority = PRIORITY_STATE_CHANGE
+                    elif p_state_raw.lower() not in QUIET_STATES:
+                        priority = PRIORITY_ACTIVE
+                    else:
+                        priority = PRIORITY_IDLE
+                    last_status = current_status
+                    last_state = p_state_raw
+
+                    if slot.online:
+                        # Only copy the frame out of the slot if the camera produced a new one
+                        jpg_data = None
+                        if slot.seq != last_seq:
+                            jpg_data = slot.get()
+                        last_seq = slot.seq
+                        
+                        if jpg_data and await change_detector.check(jpg_data):
+                            # Image changed, rotate filename to help client cache busting/transition
+                            filename_toggle = not filename_toggle
+                            filename = "stream_1.jpg" if filename_toggle else "stream_0.jpg"
                             
-                            try:
-                                if not message:
-                                    message = await channel.send(embed=embed)
-
-                                if jpg_data:
-                                    # Calculate Hash for Deduplication
-                                    cur_hash = hashlib.md5(jpg_data).hexdigest()
-                                    
-                                    if cur_hash == last_image_hash:
-                                        # Image hasn't changed, just update text
-                                        await message.edit(embed=embed)
-                                    else:
-                                        # Image changed, rotate filename to help client cache busting/transition
-                                        filename_toggle = not filename_toggle
-                                        filename = "stream_1.jpg" if filename_toggle else "stream_0.jpg"
-                                        
-                                        file = discord.File(BytesIO(jpg_data), filename=filename)
-                                        embed.set_image(url=f"attachment://{filename}")
-                                        await message.edit(embed=embed, attachments=[file])
-                                        
-                                        last_image_hash = cur_hash
-                                else:
-                                    # Offline - No image
-                                    embed.set_image(url=None)
-                                    await message.edit(embed=embed, attachments=[])
-                                    last_image_hash = None
-                                
-                                last_status = current_status
-                                last_update = now
-                                backoff = 1
-                                
-                            except discord.NotFound:
-                                message = None
-                                last_update = 0
-                            except Exception as e:
-                                logger.error(f"Discord update error for {title}: {e}")
+                            upload_data = await self.prepare_upload(stream, jpg_data)
+                            pending_image = (upload_data, filename)
+                            embed.set_image(url=f"attachment://{filename}")
+                    else:
+                        # Offline - No image
+                        pending_image = None
+                        clear_image = True
+                        embed.set_image(url=None)
+                        change_detector.reset()
+                        last_seq = None
+
+                    # Skip the edit entirely if the message would look the same
+                    if edit_needed():
+                        publisher.scheduler.request(index, publish, priority)
+                    backoff = 1
                 
                 except Exception as e:
                     logger.error(f"Stream Loop Crash {title}: {e}")
                     await asyncio.sleep(backoff)
                     backoff = min(backoff * 2, 30)
+        finally:
+            self.mosaic_sources.pop(index, None)
+            self.stream_slots.pop(index, None)
+            self.snapshot_cache.pop(index, None)
+            if printer_url:
+                self.printer_status.unwatch(printer_url)
+                self.stream_printers.pop(index, None)
+            if not poller:
+                self.camera_hub.unsubscribe(url)
+            if publisher:
+                publisher.scheduler.cancel(index)
+                await publisher.close()
+
+    async def get_publisher(self, channel, index, title):
+        """
+        Picks how a stream's message is posted. Webhook edits don't count against the
+        bot's channel rate limit; without Manage Webhooks we fall back to the bot.
+        """
+        bot_publisher = BotPublisher(channel, self.user, self.edit_scheduler)
+        if bot_config.STREAM_PUBLISHER != "webhook":
+            return bot_publisher
+
+        if not channel.permissions_for(channel.guild.me).manage_webhooks:
+            logger.warning(f"Missing Manage Webhooks in #{channel.name}, stream {index} will post as the bot.")
+            return bot_publisher
+
+        name = f"{WEBHOOK_NAME_PREFIX} {index}"
+        try:
+            async with self.webhook_lock:
+                if self.channel_webhooks is None:
+                    self.channel_webhooks = await channel.webhooks()
+                webhook = next((w for w in self.channel_webhooks if w.name == name and w.user == self.user), None)
+                if webhook is None:
+                    webhook = await channel.create_webhook(name=name, reason=f"Stream {index} dashboard")
+                    self.channel_webhooks.append(webhook)
+            return WebhookPublisher(webhook, username=title)
+        except discord.HTTPException as e:
+            logger.warning(f"Could not set up webhook for stream {index}, posting as the bot: {e}")
+            return bot_publisher
+
+    def forget_webhook(self, webhook):
+        """
+        Drops a webhook that no longer exists, so get_publisher creates a new one.
+        """
+        if self.channel_webhooks is not None:
+            self.channel_webhooks = [w for w in self.channel_webhooks if w.id != webhook.id]
+
+    async def find_stream_message(self, channel, index, embed, publisher, existing=None):
+        """
+        Reuses the stream's existing message (as found by resolve_stream_messages) or
+        posts a new one, and resets it to `embed`.
+        """
+        message = None
+        try:
+            # A message posted by the other publisher (bot vs webhook) can't be edited by this one
+            if existing and publisher.owns(existing):
+                message = await publisher.adopt(existing)
+                # Update it to Connecting state
+                await message.edit(embed=embed)
+
+            if not message:
+                 message = await publisher.send(embed=embed)
+        except Exception as e:
+             logger.error(f"Failed to find/send initial message for stream {index}: {e}")
+        return message
+
+    async def mosaic_loop(self, channel):
+        """
+        Publishes every camera as one grid image with one status embed per printer.
+        """
+        message = None
+        try:
+            message_id = self.message_ids.get("mosaic")
+            if message_id:
+                try:
+                    message = await channel.fetch_message(message_id)
+                except discord.NotFound:
+                    pass
+            if not message:
+                async for history_msg in channel.history(limit=100):
+                    if history_msg.author == self.user and history_msg.content == MOSAIC_CONTENT:
+                        message = history_msg
+                        break
+        except Exception as e:
+            logger.error(f"Failed to find mosaic message: {e}")
+
+        # One tile is only a fraction of the grid, so react to smaller changes
+        change_detector = FrameChangeDetector(threshold=0.25, executor=self.image_pool)
+        tile_width = bot_config.STREAM_MOSAIC_TILE_WIDTH
+        last_seqs = None
+        filename_toggle = False
+        pending_image = None
+        rendered = RenderedState(heartbeat=bot_config.STREAM_HEARTBEAT_SECONDS)
+
+        def mosaic_embeds():
+            # A message can hold at most 10 embeds
+            return [self.mosaic_sources[i]['embed'] for i in sorted(self.mosaic_sources)][:10]
+
+        def edit_needed():
+            if not message or pending_image:
+                return True
+            return rendered.needs_edit(render_fingerprint(embed_state(mosaic_embeds()), attachment_id(message)))
+
+        async def publish():
+            nonlocal message, pending_image, last_seqs
+            if not edit_needed():
+                return
+            image = pending_image
+            pending_image = None
+
+            embeds = mosaic_embeds()
+            try:
+                if not message:
+                    message = await channel.send(content=MOSAIC_CONTENT, embeds=embeds)
+
+                for mosaic_embed in embeds:
+                    mosaic_embed.timestamp = discord.utils.utcnow()
+                if image:
+                    data, filename = image
+                    file = discord.File(BytesIO(data), filename=filename)
+                    message = await edit_rendered(message, rendered, embeds, content=MOSAIC_CONTENT, attachments=[file])
+                else:
+                    message = await edit_rendered(message, rendered, embeds, content=MOSAIC_CONTENT)
+                self.remember_stream_message("mosaic", message)
+
+            except discord.NotFound:
+                message = None
+                last_seqs = None
+                change_detector.reset()
+                rendered.reset()
+            except Exception as e:
+                logger.error(f"Discord update error for mosaic: {e}")
+                change_detector.reset()
+                rendered.reset()
+
+        while not self.is_closed():
+            await asyncio.sleep(self.update_interval)
+            try:
+                sources = [self.mosaic_sources[i] for i in sorted(self.mosaic_sources)]
+                if not sources:
+                    continue
+
+                # Only recompose when some camera produced a new frame or went on/offline
+                seqs = [(src['slot'].seq, src['slot'].online) for src in sources]
+                if seqs != last_seqs:
+                    last_seqs = seqs
+                    tiles = [(src['title'], src['slot'].get()) for src in sources]
+                    loop = asyncio.get_running_loop()
+                    mosaic_data = await loop.run_in_executor(self.image_pool, compose_mosaic, tiles, tile_width)
+
+                    if await change_detector.check(mosaic_data):
+                        filename_toggle = not filename_toggle
+                        filename = "mosaic_1.jpg" if filename_toggle else "mosaic_0.jpg"
+                        pending_image = (mosaic_data, filename)
+
+                if edit_needed():
+                    self.edit_scheduler.request("mosaic", publish, PRIORITY_ACTIVE)
+
+            except Exception as e:
+                logger.error(f"Mosaic Loop Crash: {e}")
+
+    async def prepare_upload(self, stream, jpg_data):
+        """
+        Applies the stream's optional resize/quality stage and records the sizes.
+        """
+        max_width = int(stream.get('max_width') or 0)
+        quality = stream.get('jpeg_quality')
+        upload_data = jpg_data
+        if max_width or quality:
+            loop = asyncio.get_running_loop()
+            upload_data = await loop.run_in_executor(self.image_pool, recompress_jpeg, jpg_data, max_width, quality)
+
+        stats = self.stream_stats.setdefault(stream.get('id'), {
+            'title': stream.get('title'), 'uploads': 0, 'raw_bytes': 0, 'sent_bytes': 0
+        })
+        stats['uploads'] += 1
+        stats['raw_bytes'] += len(jpg_data)
+        stats['sent_bytes'] += len(upload_data)
+        stats['last_raw'] = len(jpg_data)
+        stats['last_sent'] = len(upload_data)
+        logger.debug(f"Upload for stream {stream.get('id')}: {len(jpg_data)} -> {len(upload_data)} bytes")
+        return upload_data
+
+    async def create_timelapse(self, stream):
+        """
+        Returns the stream's timelapse recorder, or None if timelapses are disabled for it.
+        """
+        settings = dict(bot_config.STREAM_TIMELAPSE)
+        override = stream.get('timelapse')
+        if override is False:
+            return None
+        if isinstance(override, dict):
+            settings.update(override)
+        if not settings.get('enabled') or not PILLOW_AVAILABLE:
+            return None
+        try:
+            # Loading frames left over from a restart touches the disk
+            return await asyncio.get_running_loop().run_in_executor(self.image_pool, functools.partial(
+                TimelapseRecorder,
+                os.path.join(TIMELAPSE_DIR, str(stream.get('id'))),
+                interval=float(settings.get('interval', 60)),
+                max_frames=int(settings.get('max_frames', 300)),
+                max_bytes=int(float(settings.get('max_mb', 30)) * 1024 * 1024)
+            ))
+        except OSError as e:
+            logger.error(f"Timelapse disabled for stream {stream.get('id')}: {e}")
+            return None
+
+    async def update_timelapse(self, channel, title, recorder, slot, print_stats):
+        """
+        Adds a frame per layer (or interval) while printing and posts the timelapse on completion.
+        """
+        state = (print_stats.get('state') or '').lower()
+        loop = asyncio.get_running_loop()
+        try:
+            if state == 'printing':
+                filename = print_stats.get('filename') or "print"
+                if recorder.filename != filename:
+                    await loop.run_in_executor(self.image_pool, recorder.start, filename)
+                layer = print_stats.get('layer')
+                if slot.online and recorder.should_sample(layer):
+                    jpg_data = slot.get()
+                    if jpg_data:
+                        jpg_data = await loop.run_in_executor(
+                            self.image_pool, recompress_jpeg, jpg_data, TIMELAPSE_FRAME_WIDTH, 85
+                        )
+                        await loop.run_in_executor(self.image_pool, recorder.add, jpg_data, layer)
+            elif state == 'complete' and recorder.recording:
+                try:
+                    await self.post_timelapse(channel, title, recorder)
+                finally:
+                    # Post once; retrying a failed upload would re-render the GIF every tick
+                    await loop.run_in_executor(self.image_pool, recorder.clear)
+            elif state in ('idle', 'standby', 'cancelled', 'error') and recorder.recording:
+                # The print was aborted, nothing worth posting
+                await loop.run_in_executor(self.image_pool, recorder.clear)
+        except Exception as e:
+            logger.error(f"Timelapse error for {title}: {e}")
+
+    async def post_timelapse(self, channel, title, recorder):
+        frames = [(path, caption) for path, _, caption in recorder.frames]
+        if not frames:
+            return
+        loop = asyncio.get_running_loop()
+        data = await loop.run_in_executor(self.image_pool, render_timelapse_gif, [path for path, _ in frames], TIMELAPSE_FRAME_WIDTH)
+        filename = "timelapse.gif"
+        if not data or len(data) > TIMELAPSE_MAX_UPLOAD:
+            data = await loop.run_in_executor(self.image_pool, render_contact_sheet, frames)
+            filename = "timelapse.jpg"
+
+        await channel.send(
+            content=f"🎞️ **{title}** finished `{recorder.filename}`",
+            file=discord.File(BytesIO(data), filename=filename)
+        )
+
+    def on_printer_status(self, printer_url, status):
+        """
+        Called by the status collector for every fresh printer status.
+        """
+        self.record_printer_history(printer_url, status)
+
+        estimator = self.printer_eta.get(printer_url)
+        if estimator is None:
+            estimator = self.printer_eta[printer_url] = EtaEstimator()
+        if (status.get('state') or '').lower() == 'printing':
+            estimator.update(time.monotonic(), status.get('progress'), key=status.get('filename'))
+
+    def record_printer_history(self, printer_url, status):
+        history = self.printer_history.get(printer_url)
+        if history is None:
+            history = self.printer_history[printer_url] = PrinterHistory()
+        history.record_status(status)
+
+    async def build_printer_history(self, stream, hours):
+        """
+        Returns send() kwargs summarising the last `hours` of a stream's printer.
+        """
+        title = stream.get('title', f"Stream {stream.get('id')}")
+        history = self.printer_history.get(self.stream_printers.get(stream.get('id')))
+        seconds = hours * 3600
+        if not history or not history.count:
+            return {'content': f"📈 No printer history recorded for **{title}** yet."}
+
+        now = time.time()
+        embed = discord.Embed(title=f"{title} — last {hours:g}h", color=0x3498DB)
+        series = {}
+        for field in PrinterHistory.FIELDS:
+            points = history.series(field, seconds, now)
+            stats = history.aggregate(field, seconds, now)
+            if not points or not stats:
+                continue
+            series[field] = points
+            low, high, mean = stats
+            unit = "%" if field == 'progress' else "°C"
+            factor = 100 if field == 'progress' else 1
+            embed.add_field(
+                name=field.title(),
+                value=(
+                    f"`{sparkline([v for _, v in points])}`\n"
+                    f"min {low * factor:.0f}{unit} • max {high * factor:.0f}{unit} • avg {mean * factor:.0f}{unit}"
+                ),
+                inline=False
+            )
+
+        if not series:
+            return {'content': f"📈 No printer history recorded for **{title}** in the last {hours:g}h."}
+        if not PILLOW_AVAILABLE:
+            return {'embed': embed}
+
+        loop = asyncio.get_running_loop()
+        chart = await loop.run_in_executor(self.image_pool, render_history_chart, series, seconds, now)
+        embed.set_image(url="attachment://history.png")
+        return {'embed': embed, 'file': discord.File(BytesIO(chart), filename="history.png")}
+
+    def running_streams(self):
+        return [stream for key, (_, stream) in self.stream_tasks.items() if key != "mosaic"]
+
+    def find_running_stream(self, query):
+        """
+        Finds a running stream by ID or (case-insensitive) title.
+        """
+        query = query.strip().lower()
+        for stream in self.running_streams():
+            if str(stream.get('id')) == query or str(stream.get('title', '')).lower() == query:
+                return stream
+        return None
+
+    def get_snapshot(self, stream_id):
+        """
+        Returns the newest frame a running stream already holds, or None if its camera is offline.
+        Requests for the same frame share one buffer instead of copying the slot again.
+        """
+        slot = self.stream_slots.get(stream_id)
+        if not slot or not slot.online:
+            return None
+        cached = self.snapshot_cache.get(stream_id)
+        if cached and cached[0] == slot.seq:
+            return cached[1]
+        data = slot.get()
+        if data:
+            self.snapshot_cache[stream_id] = (slot.seq, data)
+        return data
+
+    def build_snapshot(self, stream):
+        """
+        Returns send() kwargs with the stream's full-resolution snapshot, or an offline notice.
+        """
+        title = stream.get('title', f"Stream {stream.get('id')}")
+        data = self.get_snapshot(stream.get('id'))
+        if not data:
+            return {'content': f"📷 **{title}** camera is offline."}
+
+        embed = discord.Embed(title=title, color=0x2ECC71, timestamp=discord.utils.utcnow())
+        embed.set_image(url="attachment://snapshot.jpg")
+        # No "ID:" in the footer, so it is never mistaken for the stream's own message
+        embed.set_footer(text="Full-resolution snapshot")
+        return {'embed': embed, 'file': discord.File(BytesIO(data), filename="snapshot.jpg")}
+
+    def get_upload_stats_embed(self):
+        embed = discord.Embed(title="Upload Stats", color=0x3498DB)
+        if not self.stream_stats:
+            embed.description = "No images uploaded yet."
+            return embed
+
+        for stream_id, stats in self.stream_stats.items():
+            saved = 0
+            if stats['raw_bytes']:
+                saved = 100 - stats['sent_bytes'] * 100 / stats['raw_bytes']
+            value = (
+                f"**Last:** {stats['last_raw'] / 1024:.0f} KB → {stats['last_sent'] / 1024:.0f} KB\n"
+                f"**Total:** {stats['raw_bytes'] / 1048576:.1f} MB → {stats['sent_bytes'] / 1048576:.1f} MB ({saved:.0f}% saved)\n"
+                f"**Uploads:** {stats['uploads']}"
+            )
+            embed.add_field(name=f"{stats['title']} (ID: {stream_id})", value=value, inline=True)
+        return embed
+
+    async def camera_reader(self, session, url, slot):
+        """
+        Reads the camera continuously and keeps only its newest frame in `slot`.
+        """
+        while not self.is_closed():
+            async for frame in self.get_frame(session, url):
+                if frame is None:
+                    slot.set_offline()
+                else:
+                    slot.put(frame)
+            # Server closed the stream; don't hammer it with reconnects
+            await asyncio.sleep(1)
+
+    def printer_host(self, base_url):
+        if "://" in base_url:
+            return base_url.split("://")[1].split("/")[0].split(":")[0]
+        return base_url.split(":")[0]
+
+    def get_sdcp_client(self, host):
+        # Use cached client or create new
+        if host not in self.sdcp_clients:
+            client = SDCPClient(
+                host,
+                session=self.http_session,
+                on_discovery=self.remember_sdcp_identity
+            )
+            identity = self.sdcp_identities.get(host)
+            if identity:
+                client.load_cached(identity['mainboard_id'], identity.get('attributes'))
+            self.sdcp_clients[host] = client
+        return self.sdcp_clients[host]
+
+    def remember_sdcp_identity(self, client):
+        self.sdcp_identities[client.host] = {'mainboard_id': client.mainboard_id, 'attributes': client.attributes}
+        self.persist_printer_cache()
+
+    async def release_printer_clients(self, printer_url, keep=None):
+        """
+        Closes the WebSocket clients of a printer URL that no stream shows anymore, or
+        of the protocol(s) other than `keep` after a host was re-detected.
+        """
+        host = self.printer_host(printer_url)
+        watched_hosts = {self.printer_host(url) for url in self.printer_status.watched()}
+
+        if keep != MOONRAKER:
+            for base_url in [u for u in self.moonraker_clients if self.printer_host(u) == host]:
+                if keep is not None or base_url == printer_url:
+                    await self.moonraker_clients.pop(base_url).close()
+
+        sdcp_client = self.sdcp_clients.get(host)
+        if sdcp_client and keep != SDCP and (keep is not None or host not in watched_hosts):
+            del self.sdcp_clients[host]
+            await sdcp_client.close()
+
+    def get_moonraker_client(self, base_url):
+        if base_url not in self.moonraker_clients:
+            self.moonraker_clients[base_url] = MoonrakerClient(base_url, session=self.http_session)
+        return self.moonraker_clients[base_url]
+
+    def restore_printer_cache(self):
+        cache = load_printer_cache()
+        for host, entry in cache.items():
+            if entry.get('protocol'):
+                self.printer_protocols.set(host, entry['protocol'], entry.get('detected_at'))
+            if entry.get('mainboard_id'):
+                # Clients are only created (and connected) once a stream needs the printer
+                self.sdcp_identities[host] = {'mainboard_id': entry['mainboard_id'], 'attributes': entry.get('attributes')}
+        if cache:
+            logger.info(f"Loaded {len(cache)} printer(s) from cache")
+
+    def persist_printer_cache(self):
+        cache = {}
+        for host, entry in self.printer_protocols.entries.items():
+            cache[host] = {'protocol': entry['protocol'], 'detected_at': entry['detected_at']}
+        for host, identity in self.sdcp_identities.items():
+            if identity.get('mainboard_id'):
+                cache.setdefault(host, {}).update({
+                    'mainboard_id': identity['mainboard_id'],
+                    'attributes': identity.get('attributes')
+                })
+        save_printer_cache(cache)
+
+    async def discover_sdcp_printers(self):
+        address = os.getenv('SDCP_BROADCAST_ADDRESS', '255.255.255.255')
+        try:
+            found = await discover_printers(address, timeout=2.0)
+        except Exception as e:
+            logger.error(f"SDCP broadcast discovery failed: {e}")
+            return
+
+        for ip, info in found.items():
+            self.printer_protocols.set(ip, SDCP)
+            self.sdcp_identities[ip] = {'mainboard_id': info.get('MainboardID'), 'attributes': info}
+            if ip in self.sdcp_clients:
+                self.sdcp_clients[ip].apply_discovery(info)
+        self.persist_printer_cache()
+        logger.info(f"SDCP broadcast found {len(found)} printer(s)")
 
     async def fetch_printer_status(self, session, base_url):
-        # 1. Try Moonraker / Klipper API first (Standard)
+        host = self.printer_host(base_url)
+        protocol = self.printer_protocols.get(host)
+        if protocol is None:
+            protocol = await self.detect_printer_protocol(session, base_url, host)
+
+        stats = None
+        if protocol == MOONRAKER:
+            # Pushed over the subscription; plain HTTP only until the socket is up
+            stats = await self.get_moonraker_client(base_url).fetch_status()
+            if not stats:
+                stats = await self.fetch_moonraker_status(session, base_url)
+        elif protocol == SDCP:
+            stats = await self.fetch_sdcp_status(host)
+        else:
+            return {}
+
+        if stats:
+            self.printer_protocols.record_success(host)
+            return stats
+
+        self.printer_protocols.record_failure(host)
+        return {}
+
+    async def detect_printer_protocol(self, session, base_url, host):
+        """
+        Probes Moonraker first, then SDCP, and caches whichever answered.
+        A host whose SDCP client already knows its MainboardID stays SDCP; the
+        client re-validates the ID itself if the printer starts rejecting it.
+        """
+        lock = self.detect_locks.setdefault(host, asyncio.Lock())
+        async with lock:
+            # Another printer URL on the same host may have finished detection while we waited
+            protocol = self.printer_protocols.get(host)
+            if protocol is not None:
+                return protocol
+
+            sdcp_client = self.sdcp_clients.get(host)
+            if host in self.sdcp_identities or (sdcp_client and sdcp_client.connected):
+                protocol = SDCP
+            elif await self.fetch_moonraker_status(session, base_url):
+                protocol = MOONRAKER
+            elif await self.get_sdcp_client(host).discover_mainboard_id():
+                protocol = SDCP
+            else:
+                protocol = NONE
+
+            logger.info(f"Detected printer protocol for {host}: {protocol}")
+            self.printer_protocols.set(host, protocol)
+            self.persist_printer_cache()
+            # Stop the sockets of whatever the host was speaking before
+            await self.release_printer_clients(base_url, keep=protocol)
+            return protocol
+
+    async def fetch_moonraker_status(self, session, base_url):
         try:
             url = f"{base_url}/printer/objects/query?print_stats&display_status"
             async with session.get(url, timeout=2) as response:
@@ -506,10 +1461,10 @@ class StreamBot(discord.Client):
                     filename = stats.get('filename')
                     state = stats.get('state')
                     
-                    # If we are printing but have no filename, or if response is empty, 
-                    # we might want to try SDCP as a fallback for Elegoo printers.
+                    # If we are printing but have no filename, this is probably not a real
+                    # Klipper host; repeated failures make us re-probe and fall back to SDCP.
                     if state == "printing" and not filename:
-                        logger.warning(f"Moonraker returned 'printing' but no filename for {base_url}. Trying SDCP fallback.")
+                        logger.warning(f"Moonraker returned 'printing' but no filename for {base_url}.")
                     elif state:
                          return {
                             'filename': filename,
@@ -518,26 +1473,15 @@ class StreamBot(discord.Client):
                             'progress': display.get('progress', 0)
                         }
         except Exception as e:
-            # Moonraker failed, ignore for now and try SDCP
             logger.debug(f"Moonraker fetch failed for {base_url}: {e}")
-            pass
 
-        # 2. Try SDCP (Elegoo)
+        return None
+
+    async def fetch_sdcp_status(self, host):
         try:
-            # Extract Host
-            host = "unknown"
-            if "://" in base_url:
-                host = base_url.split("://")[1].split("/")[0].split(":")[0]
-            else:
-                host = base_url.split(":")[0]
-                
-            # Use cached client or create new
-            if host not in self.sdcp_clients:
-                self.sdcp_clients[host] = SDCPClient(host)
+            client = self.get_sdcp_client(host)
             
-            client = self.sdcp_clients[host]
-            
-            # Fetch
+            # Non-blocking read of the status the printer pushed over its open socket
             sdcp_result = await client.fetch_status()
             if sdcp_result:
                  return sdcp_result
@@ -545,9 +1489,25 @@ class StreamBot(discord.Client):
                 logger.debug(f"SDCP fetch returned empty for {host}")
                  
         except Exception as e:
-            logger.error(f"Failed to fetch printer status (SDCP) {base_url}: {e}")
+            logger.error(f"Failed to fetch printer status (SDCP) {host}: {e}")
             
-        return {}
+        return None
+
+    def get_protocol_embed(self):
+        embed = discord.Embed(title="Printer Protocols", color=0x3498DB)
+        if not self.printer_protocols.entries:
+            embed.description = "No printers detected yet."
+            return embed
+
+        for host, entry in self.printer_protocols.entries.items():
+            cached = self.printer_protocols.get(host) is not None
+            value = (
+                f"**Protocol:** {entry['protocol']}\n"
+                f"**Detected:** <t:{int(entry['detected_at'])}:R>\n"
+                f"**Failures:** {entry['failures']}" + ("" if cached else " (re-probe pending)")
+            )
+            embed.add_field(name=host, value=value, inline=True)
+        return embed
 
     async def on_message(self, message):
         if message.author == self.user:
@@ -574,24 +1534,48 @@ class StreamBot(discord.Client):
              
              await message.channel.send(embed=embed, view=StreamAdminView(self))
              return
+
+        if message.content == "!snapshot" or message.content.startswith("!snapshot "):
+            query = message.content[len("!snapshot"):].strip()
+            stream = self.find_running_stream(query) if query else None
+            if not stream:
+                names = ", ".join(f"`{s.get('title')}` ({s.get('id')})" for s in self.running_streams()) or "none"
+                await message.reply(f"Usage: `!snapshot <stream name or ID>`\nStreams: {names}")
+                return
+            await message.reply(**self.build_snapshot(stream))
+            return
+
+        if message.content == "!printer_history" or message.content.startswith("!printer_history "):
+            stream, hours = parse_history_query(message.content[len("!printer_history"):], self.find_running_stream)
+            if not stream:
+                names = ", ".join(f"`{s.get('title')}` ({s.get('id')})" for s in self.running_streams()) or "none"
+                await message.reply(f"Usage: `!printer_history <stream name or ID> [hours]`\nStreams: {names}")
+                return
+            await message.reply(**await self.build_printer_history(stream, hours))
+            return
+
         # Simple command to force restart streams if needed
         if message.content == "!restart_streams" and message.author.guild_permissions.administrator:
             await message.channel.send("Restarting streams & purging channel...", delete_after=5)
             await self.purge_and_restart()
 
     async def purge_and_restart(self):
-        # Cancel all streams first
-        for task in self.stream_tasks:
-            task.cancel()
-        self.stream_tasks = []
+        # Held across stop, purge and start so an admin action can't add a stream in between
+        async with self.streams_lock:
+            # Cancel all streams first
+            await self.stop_all_streams()
+            # The purge deletes every remembered message
+            self.message_ids = {}
+            save_stream_state(self.message_ids)
+            self.edit_scheduler.clear()
 
-        channel = self.get_channel(self.channel_id)
-        if channel:
-            try:
-                # Purge channel
-                await channel.purge(limit=100)
-            except Exception as e:
-                logger.error(f"Failed to purge channel: {e}")
-        
-        # Restart
-        await self.start_streams()
+            channel = self.get_channel(self.channel_id)
+            if channel:
+                try:
+                    # Purge channel
+                    await channel.purge(limit=100)
+                except Exception as e:
+                    logger.error(f"Failed to purge channel: {e}")
+
+            # Restart
+            await self._start_streams()
@@ -0,0 +1,77 @@
+import unittest
+import asyncio
+import os
+import sys
+import time
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.edit_scheduler import EditScheduler, PRIORITY_STATE_CHANGE, PRIORITY_ACTIVE, PRIORITY_IDLE
+
+class TestEditScheduler(unittest.TestCase):
+    def run_scheduler(self, scheduler, setup, until):
+        async def main():
+            setup()
+            scheduler.start()
+            while not until():
+                await asyncio.sleep(0.01)
+            await scheduler.stop()
+        asyncio.run(asyncio.wait_for(main(), timeout=5))
+
+    def test_token_bucket_pacing(self):
+        scheduler = EditScheduler(rate=2, per=0.2)
+        sent = []
+
+        def make(key):
+            async def callback():
+                sent.append(time.monotonic())
+            return callback
+
+        def setup():
+            for key in range(4):
+                scheduler.request(key, make(key))
+
+        start = time.monotonic()
+        self.run_scheduler(scheduler, setup, lambda: len(sent) == 4)
+
+        # The first two use the full bucket, the rest wait for a refill (one per 0.1s)
+        self.assertLess(sent[1] - start, 0.05)
+        self.assertGreaterEqual(sent[3] - start, 0.18)
+
+    def test_priority_order(self):
+        scheduler = EditScheduler(rate=10, per=1.0)
+        sent = []
+
+        def make(key):
+            async def callback():
+                sent.append(key)
+            return callback
+
+        def setup():
+            scheduler.request('idle', make('idle'), PRIORITY_IDLE)
+            scheduler.request('active', make('active'), PRIORITY_ACTIVE)
+            scheduler.request('idle2', make('idle2'), PRIORITY_IDLE)
+            scheduler.request('changed', make('changed'), PRIORITY_STATE_CHANGE)
+
+        self.run_scheduler(scheduler, setup, lambda: len(sent) == 4)
+        self.assertEqual(sent, ['changed', 'active', 'idle', 'idle2'])
+
+    def test_repeated_requests_merge(self):
+        scheduler = EditScheduler(rate=10, per=1.0)
+        sent = []
+
+        def make(label):
+            async def callback():
+                sent.append(label)
+            return callback
+
+        def setup():
+            scheduler.request('cam', make('old'), PRIORITY_IDLE)
+            scheduler.request('other', make('other'), PRIORITY_ACTIVE)
+            scheduler.request('cam', make('new'), PRIORITY_STATE_CHANGE)
+
+        self.run_scheduler(scheduler, setup, lambda: len(sent) == 2)
+        # One edit for 'cam', with the newest callback and the most urgent priority
+        self.assertEqual(sent, ['new', 'other'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,42 @@
+import unittest
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.eta import EtaEstimator
+
+class TestEtaEstimator(unittest.TestCase):
+    def test_needs_enough_samples(self):
+        eta = EtaEstimator(min_samples=5, min_span=120)
+        for t in range(0, 60, 10):
+            eta.update(t, 0.01 + t / 1000, key="a")
+        self.assertIsNone(eta.estimate(60))
+
+    def test_linear_progress(self):
+        # 1% per minute: a print that finishes at t = 6000
+        eta = EtaEstimator(smoothing=1.0)
+        for t in range(60, 3000, 30):
+            eta.update(t, t / 6000, key="a")
+        left, band = eta.estimate(3000)
+        self.assertAlmostEqual(left, 3000, delta=1)
+        self.assertAlmostEqual(band, 0, delta=1)
+
+    def test_slow_start_is_forgotten(self):
+        # Slow first layers, then the print speeds up and finishes at t = 4000
+        eta = EtaEstimator(half_life=300)
+        for t in range(0, 3000, 5):
+            progress = 0.02 * t / 600 if t < 600 else 0.02 + 0.98 * (t - 600) / 3400
+            eta.update(t, max(progress, 0.001), key="a")
+        left, _ = eta.estimate(3000)
+        self.assertAlmostEqual(left, 1000, delta=60)
+
+    def test_new_print_resets(self):
+        eta = EtaEstimator(smoothing=1.0)
+        for t in range(60, 1200, 30):
+            eta.update(t, t / 2400, key="a")
+        eta.update(1230, 0.01, key="b")
+        self.assertIsNone(eta.estimate(1230))
+        self.assertEqual(eta.key, "b")
+
+if __name__ == '__main__':
+    unittest.main()
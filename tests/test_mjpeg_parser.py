@@ -0,0 +1,90 @@
+import unittest
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.mjpeg_parser import MJPEGFrameExtractor, MultipartMJPEGParser, create_frame_parser, parse_boundary
+
+def make_jpeg(payload):
+    return b'\xff\xd8' + payload + b'\xff\xd9'
+
+class TestMJPEGFrameExtractor(unittest.TestCase):
+    def test_frames_split_across_chunks(self):
+        frame_a = make_jpeg(b'A' * 100)
+        frame_b = make_jpeg(b'B' * 50)
+        stream = b'--boundary\r\n' + frame_a + b'\r\n--boundary\r\n' + frame_b + b'\r\n'
+
+        extractor = MJPEGFrameExtractor()
+        frames = []
+        # Feed in tiny chunks so markers straddle chunk boundaries
+        for i in range(0, len(stream), 3):
+            frames.extend(bytes(f) for f in extractor.feed(stream[i:i + 3]))
+
+        self.assertEqual(frames, [frame_a, frame_b])
+
+    def test_multiple_frames_in_one_chunk(self):
+        frames = [make_jpeg(bytes([i]) * 10) for i in range(5)]
+        extractor = MJPEGFrameExtractor()
+        result = [bytes(f) for f in extractor.feed(b'junk'.join(frames))]
+        self.assertEqual(result, frames)
+
+    def test_views_are_released_on_next_feed(self):
+        extractor = MJPEGFrameExtractor()
+        frame = extractor.feed(make_jpeg(b'x'))[0]
+        extractor.feed(make_jpeg(b'y'))
+        with self.assertRaises(ValueError):
+            bytes(frame)
+
+    def test_held_export_does_not_break_parsing(self):
+        extractor = MJPEGFrameExtractor()
+        frame = extractor.feed(make_jpeg(b'x') + b'\xff\xd8partial')[0]
+        kept = memoryview(frame)  # Caller keeps an export alive
+        result = [bytes(f) for f in extractor.feed(b'\xff\xd9')]
+        self.assertEqual(result, [b'\xff\xd8partial\xff\xd9'])
+        self.assertEqual(bytes(kept), make_jpeg(b'x'))
+
+    def test_overflow_resets_buffer(self):
+        extractor = MJPEGFrameExtractor(max_buffer=64)
+        self.assertEqual(extractor.feed(b'\xff\xd8' + b'z' * 100), [])
+        self.assertEqual([bytes(f) for f in extractor.feed(make_jpeg(b'ok'))], [make_jpeg(b'ok')])
+
+def make_part(jpeg, boundary=b'--frame', length=True):
+    headers = b'Content-Type: image/jpeg\r\n'
+    if length:
+        headers += b'Content-Length: ' + str(len(jpeg)).encode() + b'\r\n'
+    return boundary + b'\r\n' + headers + b'\r\n' + jpeg + b'\r\n'
+
+class TestMultipartMJPEGParser(unittest.TestCase):
+    def test_parse_boundary(self):
+        self.assertEqual(parse_boundary('multipart/x-mixed-replace;boundary=frame'), 'frame')
+        self.assertEqual(parse_boundary('multipart/x-mixed-replace; boundary="--frame"'), '--frame')
+        self.assertIsNone(parse_boundary('image/jpeg'))
+        self.assertIsNone(parse_boundary(None))
+
+    def test_factory_falls_back_to_markers(self):
+        self.assertIsInstance(create_frame_parser('multipart/x-mixed-replace;boundary=frame'), MultipartMJPEGParser)
+        self.assertIsInstance(create_frame_parser(None), MJPEGFrameExtractor)
+
+    def test_content_length_ignores_nested_markers(self):
+        # An EXIF thumbnail carries its own SOI/EOI inside the outer frame
+        jpeg = make_jpeg(b'exif' + make_jpeg(b'thumb') + b'image data')
+        stream = make_part(jpeg) + make_part(make_jpeg(b'second'))
+
+        parser = MultipartMJPEGParser('frame')
+        frames = []
+        for i in range(0, len(stream), 7):
+            frames.extend(bytes(f) for f in parser.feed(stream[i:i + 7]))
+
+        self.assertEqual(frames, [jpeg, make_jpeg(b'second')])
+
+    def test_parts_without_content_length_end_at_boundary(self):
+        jpeg = make_jpeg(b'a' + make_jpeg(b'thumb') + b'b')
+        stream = make_part(jpeg, length=False) + make_part(make_jpeg(b'c'), length=False) + b'--frame\r\n'
+
+        parser = MultipartMJPEGParser('--frame')
+        frames = [bytes(f) for f in parser.feed(stream)]
+
+        self.assertEqual(frames, [jpeg, make_jpeg(b'c')])
+
+if __name__ == '__main__':
+    unittest.main()
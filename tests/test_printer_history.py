@@ -0,0 +1,71 @@
+import unittest
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.printer_history import PrinterHistory, sparkline
+from bots.stream_bot import parse_history_query
+
+class TestPrinterHistory(unittest.TestCase):
+    def test_ring_buffer_overwrites_oldest(self):
+        history = PrinterHistory(capacity=4)
+        for t in range(6):
+            history.append(float(t), bed=float(t))
+
+        self.assertEqual(history.count, 4)
+        self.assertEqual(history.series('bed'), [(2.0, 2.0), (3.0, 3.0), (4.0, 4.0), (5.0, 5.0)])
+
+    def test_window_aggregate_skips_missing(self):
+        history = PrinterHistory(capacity=10)
+        history.append(100.0, nozzle=200.0)
+        history.append(110.0, nozzle=210.0)
+        history.append(120.0)  # No nozzle reading
+        history.append(130.0, nozzle=230.0)
+
+        self.assertEqual(history.aggregate('nozzle', seconds=25, now=130.0), (210.0, 230.0, 220.0))
+        self.assertEqual(history.aggregate('nozzle'), (200.0, 230.0, 640.0 / 3))
+        self.assertIsNone(history.aggregate('chamber'))
+
+    def test_record_status_respects_sample_interval(self):
+        history = PrinterHistory(capacity=10, sample_interval=10)
+        status = {'progress': 0.5, 'temps': {'bed': (60, 60), 'nozzle': (215, 215), 'chamber': 30}}
+
+        self.assertTrue(history.record_status(status, now=1000))
+        self.assertFalse(history.record_status(status, now=1005))
+        self.assertTrue(history.record_status(status, now=1010))
+        self.assertEqual(history.series('progress'), [(1000, 0.5), (1010, 0.5)])
+        self.assertEqual(history.series('bed')[-1], (1010, 60.0))
+
+    def test_sparkline(self):
+        self.assertEqual(sparkline([0, 7]), "▁█")
+        self.assertEqual(sparkline([5, 5, 5]), "▁▁▁")
+        self.assertEqual(len(sparkline(list(range(100)), width=10)), 10)
+
+STREAMS = [{'id': 1, 'title': "Printer 1"}, {'id': 2, 'title': "Voron"}]
+
+def find_stream(query):
+    query = query.strip().lower()
+    return next((s for s in STREAMS if str(s['id']) == query or s['title'].lower() == query), None)
+
+class TestParseHistoryQuery(unittest.TestCase):
+    def test_name_ending_in_number(self):
+        self.assertEqual(parse_history_query(" Printer 1", find_stream), (STREAMS[0], 4.0))
+
+    def test_name_ending_in_number_with_hours(self):
+        self.assertEqual(parse_history_query(" Printer 1 2", find_stream), (STREAMS[0], 2.0))
+
+    def test_id_and_hours(self):
+        self.assertEqual(parse_history_query(" 2 0.5", find_stream), (STREAMS[1], 0.5))
+        self.assertEqual(parse_history_query(" voron 10", find_stream), (STREAMS[1], 4.0))
+
+    def test_unknown_stream(self):
+        self.assertIsNone(parse_history_query("", find_stream)[0])
+        self.assertIsNone(parse_history_query(" Prusa", find_stream)[0])
+        self.assertIsNone(parse_history_query(" Prusa 2", find_stream)[0])
+
+    def test_non_finite_hours(self):
+        self.assertEqual(parse_history_query(" 2 nan", find_stream), (None, 4.0))
+        self.assertEqual(parse_history_query(" 2 inf", find_stream), (None, 4.0))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,58 @@
+import unittest
+import asyncio
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import discord
+from utils.edit_scheduler import EditScheduler
+from utils.stream_publisher import RenderedState, embed_state, render_fingerprint, attachment_id, edit_rendered
+
+class SlowMessage:
+    """
+    Message whose edits take a while, like a real round trip to Discord.
+    """
+    def __init__(self):
+        self.attachments = []
+        self.shown = []
+
+    async def edit(self, embeds, **kwargs):
+        description = embeds[0].description
+        await asyncio.sleep(0.05)
+        self.shown.append(description)
+        return self
+
+class TestEditRendered(unittest.TestCase):
+    def test_change_during_edit_is_still_sent(self):
+        embed = discord.Embed(description="Printing")
+        message = SlowMessage()
+        rendered = RenderedState(heartbeat=0)
+
+        def edit_needed():
+            return rendered.needs_edit(render_fingerprint(embed_state([embed]), attachment_id(message)))
+
+        async def publish():
+            if edit_needed():
+                await edit_rendered(message, rendered, [embed])
+
+        async def main():
+            scheduler = EditScheduler(rate=10, per=1.0)
+            scheduler.start()
+            scheduler.request("stream", publish)
+            await asyncio.sleep(0.02)
+
+            # The next tick changes the embed while the first edit is in flight
+            embed.description = "Complete"
+            if edit_needed():
+                scheduler.request("stream", publish)
+
+            while len(message.shown) < 2:
+                await asyncio.sleep(0.01)
+            await scheduler.stop()
+
+        asyncio.run(asyncio.wait_for(main(), timeout=5))
+        self.assertEqual(message.shown, ["Printing", "Complete"])
+        self.assertFalse(edit_needed())
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,70 @@
+import unittest
+import os
+import sys
+import tempfile
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.timelapse import TimelapseRecorder
+
+def jpg_files(directory):
+    return sorted(name for name in os.listdir(directory) if name.endswith(".jpg"))
+
+class TestTimelapseRecorder(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.directory = os.path.join(self.tmp.name, "1")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_evicts_oldest_by_frame_count(self):
+        recorder = TimelapseRecorder(self.directory, max_frames=3, max_bytes=10 ** 6)
+        recorder.start("part.gcode")
+        for layer in range(5):
+            recorder.add(b"x" * 10, layer)
+
+        self.assertEqual([caption for _, _, caption in recorder.frames], ["Layer 2", "Layer 3", "Layer 4"])
+        self.assertEqual(jpg_files(self.directory), ["frame_000002.jpg", "frame_000003.jpg", "frame_000004.jpg"])
+        self.assertEqual(recorder.total_bytes, 30)
+
+    def test_evicts_oldest_by_size(self):
+        recorder = TimelapseRecorder(self.directory, max_frames=100, max_bytes=250)
+        recorder.start("part.gcode")
+        for layer in range(10):
+            recorder.add(b"x" * 100, layer)
+
+        self.assertEqual(len(recorder.frames), 2)
+        self.assertLessEqual(recorder.total_bytes, 250)
+        self.assertEqual(sum(os.path.getsize(os.path.join(self.directory, n)) for n in jpg_files(self.directory)), 200)
+
+    def test_resumes_after_restart(self):
+        recorder = TimelapseRecorder(self.directory, max_frames=3)
+        recorder.start("part.gcode")
+        for layer in range(4):
+            recorder.add(b"x" * 10, layer)
+
+        restarted = TimelapseRecorder(self.directory, max_frames=3)
+        self.assertTrue(restarted.recording)
+        self.assertEqual(restarted.filename, "part.gcode")
+        self.assertEqual([caption for _, _, caption in restarted.frames], ["Layer 1", "Layer 2", "Layer 3"])
+        self.assertEqual(restarted.total_bytes, 30)
+
+        # Same print continues with new file names; a different print starts over
+        restarted.start("part.gcode")
+        restarted.add(b"y" * 10, 4)
+        self.assertEqual(jpg_files(self.directory)[-1], "frame_000004.jpg")
+        restarted.start("other.gcode")
+        self.assertEqual(jpg_files(self.directory), [])
+        self.assertEqual(len(restarted.frames), 0)
+
+    def test_drops_untracked_files_on_load(self):
+        os.makedirs(self.directory)
+        with open(os.path.join(self.directory, "frame_000000.jpg"), 'wb') as f:
+            f.write(b"stale")
+
+        recorder = TimelapseRecorder(self.directory)
+        self.assertFalse(recorder.recording)
+        self.assertEqual(jpg_files(self.directory), [])
+
+if __name__ == '__main__':
+    unittest.main()
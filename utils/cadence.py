@@ -0,0 +1,51 @@
+class CadencePolicy:
+    """
+    Decides how often a stream is refreshed based on what its printer is doing.
+
+    Working printers (heating, printing, ...) are refreshed every `active`
+    seconds, idle or offline ones every `idle` seconds. Any change of camera or
+    printer state (e.g. Printing -> Complete) triggers `burst_ticks` refreshes
+    at the `burst` interval so transitions show up quickly.
+    """
+    def __init__(self, active=3.0, idle=15.0, burst=1.0, burst_ticks=5):
+        self.active = float(active)
+        self.idle = float(idle)
+        self.burst = float(burst)
+        self.burst_ticks = int(burst_ticks)
+        self.is_active = True  # Refresh quickly until we know the printer state
+        self._state = None
+        self._burst_left = 0
+
+    @classmethod
+    def from_config(cls, defaults, overrides=None):
+        """
+        Builds a policy from the bot-wide defaults with a stream's own settings on top.
+        """
+        settings = dict(defaults)
+        settings.update(overrides or {})
+        return cls(**{k: v for k, v in settings.items() if k in ('active', 'idle', 'burst', 'burst_ticks')})
+
+    def observe(self, state, active):
+        """
+        Records the stream's state after a tick. `state` is any comparable value
+        (e.g. camera and printer status); `active` says whether the printer is working.
+        """
+        if self._state is not None and state != self._state:
+            self._burst_left = self.burst_ticks
+        elif self._burst_left:
+            self._burst_left -= 1
+        self._state = state
+        self.is_active = active
+
+    @property
+    def interval(self):
+        if self._burst_left:
+            return self.burst
+        return self.active if self.is_active else self.idle
+
+    def describe(self):
+        if self._burst_left:
+            return f"{self.burst:g}s (burst)"
+        if self.is_active:
+            return f"{self.active:g}s"
+        return f"{self.idle:g}s (idle)"
@@ -0,0 +1,47 @@
+import asyncio
+import logging
+
+from utils.frame_slot import FrameSlot
+
+logger = logging.getLogger("CameraHub")
+
+class CameraHub:
+    """
+    Shares one upstream connection per camera URL between any number of subscribers.
+
+    The first subscriber starts a reader that keeps the camera's newest frame in
+    a shared FrameSlot; when the last subscriber leaves the reader is stopped.
+    """
+    def __init__(self, reader):
+        self.reader = reader  # async reader(url, slot), runs until cancelled
+        self.feeds = {}       # url -> {'slot', 'task', 'subscribers'}
+
+    def subscribe(self, url):
+        """
+        Returns the shared FrameSlot of `url`, connecting to the camera if needed.
+        """
+        feed = self.feeds.get(url)
+        if feed is None:
+            slot = FrameSlot()
+            feed = {'slot': slot, 'task': asyncio.create_task(self.reader(url, slot)), 'subscribers': 0}
+            self.feeds[url] = feed
+            logger.info(f"Opened camera feed {url}")
+        feed['subscribers'] += 1
+        return feed['slot']
+
+    def unsubscribe(self, url):
+        feed = self.feeds.get(url)
+        if not feed:
+            return
+        feed['subscribers'] -= 1
+        if feed['subscribers'] <= 0:
+            del self.feeds[url]
+            feed['task'].cancel()
+            logger.info(f"Closed camera feed {url}")
+
+    async def close(self):
+        tasks = [feed['task'] for feed in self.feeds.values()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self.feeds = {}
@@ -0,0 +1,89 @@
+import asyncio
+import logging
+import time
+
+logger = logging.getLogger("EditScheduler")
+
+# Lower numbers are sent first
+PRIORITY_STATE_CHANGE = 0  # Camera or printer state changed
+PRIORITY_ACTIVE = 1        # Periodic refresh of a printer that is working
+PRIORITY_IDLE = 2          # Periodic refresh of an idle/offline printer
+
+class EditScheduler:
+    """
+    Sends message edits for one channel without exceeding its rate limit.
+
+    Each stream registers a callback under its key; requesting again while one
+    is pending only updates the callback and priority, so a stream never has
+    more than one queued edit and the callback renders its newest state when
+    it finally runs. Pending edits are sent by priority, oldest request first,
+    which round-robins streams of equal priority.
+    """
+    def __init__(self, rate=5, per=5.0):
+        self.rate = rate
+        self.per = per
+        self._tokens = float(rate)
+        self._updated = time.monotonic()
+        self._pending = {}  # key -> [priority, requested_at, callback]
+        self._wakeup = asyncio.Event()
+        self._task = None
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self._pending.clear()
+
+    def request(self, key, callback, priority=PRIORITY_IDLE):
+        entry = self._pending.get(key)
+        if entry:
+            entry[0] = min(entry[0], priority)
+            entry[2] = callback
+        else:
+            self._pending[key] = [priority, time.monotonic(), callback]
+        self._wakeup.set()
+
+    def cancel(self, key):
+        self._pending.pop(key, None)
+
+    def clear(self):
+        self._pending.clear()
+
+    async def _run(self):
+        while True:
+            if not self._pending:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+
+            await self._acquire()
+            if not self._pending:
+                # Everything was cancelled while we waited for budget; give the token back
+                self._tokens = min(self.rate, self._tokens + 1)
+                continue
+
+            key = min(self._pending, key=lambda k: (self._pending[k][0], self._pending[k][1]))
+            _, _, callback = self._pending.pop(key)
+            try:
+                await callback()
+            except Exception as e:
+                logger.error(f"Scheduled edit for {key} failed: {e}")
+
+    async def _acquire(self):
+        # Token bucket: `rate` edits per `per` seconds, refilled continuously
+        while True:
+            now = time.monotonic()
+            self._tokens = min(self.rate, self._tokens + (now - self._updated) * self.rate / self.per)
+            self._updated = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return
+            await asyncio.sleep((1 - self._tokens) * self.per / self.rate)
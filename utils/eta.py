@@ -0,0 +1,108 @@
+import math
+
+class EtaEstimator:
+    """
+    Estimates when a print finishes from its recent (time, progress) samples.
+
+    Progress is fitted as a straight line over time by least squares with
+    exponentially decaying weights (half-life `half_life` seconds). The fit only
+    needs a few running sums, so every update is O(1), and early phases of the
+    print (heating, slow first layers) gradually stop mattering. The predicted
+    finish time is smoothed, and a band is derived from the slope's standard error.
+    """
+    def __init__(self, half_life=900, smoothing=0.2, min_samples=5, min_span=120):
+        self.half_life = half_life
+        self.smoothing = smoothing    # Weight of a new prediction in the smoothed finish time
+        self.min_samples = min_samples
+        self.min_span = min_span      # Seconds of samples needed before estimating
+        self.key = None
+        self.reset()
+
+    def reset(self):
+        self._t0 = None
+        self._last_t = None
+        self._last_progress = None
+        self._n = 0
+        # Decayed sums of w, w², w·x, w·y, w·x², w·x·y, w·y²
+        self._w = self._w2 = self._x = self._y = self._xx = self._xy = self._yy = 0.0
+        self.finish = None            # Smoothed finish time (same clock as the samples)
+        self.band = None              # Half-width of the finish time band in seconds, None if unbounded
+
+    def update(self, t, progress, key=None):
+        """
+        Adds a sample of `progress` (0..1) at time `t`. A different `key` (e.g. the
+        print's filename) or progress going backwards starts a new fit.
+        """
+        if progress is None or progress <= 0:
+            return
+        if key != self.key or (self._last_progress is not None and progress < self._last_progress - 0.01):
+            self.reset()
+            self.key = key
+        if self._t0 is None:
+            self._t0 = t
+
+        if self._last_t is not None:
+            decay = 0.5 ** (max(t - self._last_t, 0) / self.half_life)
+            self._w *= decay
+            self._w2 *= decay * decay
+            self._x *= decay
+            self._y *= decay
+            self._xx *= decay
+            self._xy *= decay
+            self._yy *= decay
+
+        x = t - self._t0
+        self._w += 1
+        self._w2 += 1
+        self._x += x
+        self._y += progress
+        self._xx += x * x
+        self._xy += x * progress
+        self._yy += progress * progress
+        self._n += 1
+        self._last_t = t
+        self._last_progress = progress
+
+        if progress >= 1:
+            self.finish = t
+            self.band = 0.0
+        elif self._n >= self.min_samples and x >= self.min_span:
+            self._fit()
+
+    def _fit(self):
+        mean_x = self._x / self._w
+        mean_y = self._y / self._w
+        sxx = self._xx - self._w * mean_x * mean_x
+        sxy = self._xy - self._w * mean_x * mean_y
+        syy = self._yy - self._w * mean_y * mean_y
+        if sxx <= 0 or sxy <= 0:
+            return # Progress isn't moving (e.g. paused), keep the last estimate
+
+        slope = sxy / sxx
+        finish = self._t0 + mean_x + (1 - mean_y) / slope
+
+        # Standard error of the slope, using the effective number of weighted samples
+        n_eff = self._w * self._w / self._w2
+        band = None
+        if n_eff > 2:
+            residual = max(syy - slope * sxy, 0.0) / (n_eff - 2)
+            slope_error = 2 * math.sqrt(residual / sxx)
+            if slope - slope_error > 0:
+                early = mean_x + (1 - mean_y) / (slope + slope_error)
+                late = mean_x + (1 - mean_y) / (slope - slope_error)
+                band = (late - early) / 2
+
+        if self.finish is None:
+            self.finish = finish
+        else:
+            self.finish += self.smoothing * (finish - self.finish)
+        self.band = band
+
+    def estimate(self, now):
+        """
+        Returns (seconds left, band half-width in seconds or None), or None before
+        enough samples were seen.
+        """
+        if self.finish is None:
+            return None
+        return max(self.finish - now, 0.0), self.band
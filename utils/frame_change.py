@@ -0,0 +1,53 @@
+import asyncio
+import hashlib
+import time
+
+from utils.image_tools import frame_signature, signature_difference
+
+class FrameChangeDetector:
+    """
+    Decides whether a camera frame is visibly different from the last uploaded one.
+
+    Frames are reduced to a tiny grayscale thumbnail in a worker thread and
+    compared against the thumbnail of the last upload, so JPEG noise doesn't
+    trigger a new upload but slow changes still add up. A refresh is forced
+    every `refresh_interval` seconds regardless. A threshold of 0 (or a missing
+    Pillow install) falls back to comparing the JPEG bytes.
+    """
+    def __init__(self, threshold=1.0, refresh_interval=300, executor=None):
+        self.threshold = threshold              # Percent of thumbnail pixels that must change
+        self.refresh_interval = refresh_interval
+        self.executor = executor                # None uses the loop's default executor
+        self._last_signature = None
+        self._last_digest = None
+        self._last_upload = None
+
+    def reset(self):
+        self._last_signature = None
+        self._last_digest = None
+        self._last_upload = None
+
+    async def check(self, jpg_data):
+        """
+        Returns True if `jpg_data` should be uploaded, and remembers it as the new reference.
+        """
+        now = time.monotonic()
+        forced = self._last_upload is None or now - self._last_upload >= self.refresh_interval
+
+        signature = None
+        if self.threshold > 0:
+            loop = asyncio.get_running_loop()
+            signature = await loop.run_in_executor(self.executor, frame_signature, jpg_data)
+
+        if signature is not None:
+            changed = forced or signature_difference(signature, self._last_signature) >= self.threshold
+            digest = None
+        else:
+            digest = hashlib.md5(jpg_data).hexdigest()
+            changed = forced or digest != self._last_digest
+
+        if changed:
+            self._last_signature = signature
+            self._last_digest = digest
+            self._last_upload = now
+        return changed
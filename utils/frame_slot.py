@@ -0,0 +1,62 @@
+import asyncio
+
+class FrameSlot:
+    """
+    Holds only the most recent complete frame of a camera.
+
+    The camera reader overwrites the slot in place for every frame it receives,
+    and consumers copy it out on their own schedule. Frames nobody asks for are
+    never copied out of the slot. Any number of consumers can share one slot.
+    """
+    def __init__(self):
+        self._data = bytearray()
+        self.seq = 0            # Incremented for every new frame
+        self.online = None      # None until the first frame or failure
+        self.state_version = 0  # Incremented whenever `online` changes
+        self._state_changed = asyncio.Event()
+
+    def put(self, frame):
+        self._data[:] = frame
+        self.seq += 1
+        if self.online is not True:
+            self.online = True
+            self._notify()
+
+    def set_online(self):
+        # Only meaningful once a frame has been stored
+        if self._data and self.online is not True:
+            self.online = True
+            self._notify()
+
+    def set_offline(self):
+        if self.online is not False:
+            self.online = False
+            self._notify()
+
+    def _notify(self):
+        # Wake every current waiter, then start a fresh event for the next change
+        self.state_version += 1
+        self._state_changed.set()
+        self._state_changed = asyncio.Event()
+
+    def get(self):
+        """
+        Returns a copy of the newest frame, or None while the camera is offline.
+        """
+        if not self.online or not self._data:
+            return None
+        return bytes(self._data)
+
+    async def wait_for_state_change(self, timeout=None, version=None):
+        """
+        Waits until the camera goes online/offline or the timeout passes.
+        Pass the `state_version` seen last time so a change that happened between
+        calls returns immediately. Returns True if the state changed.
+        """
+        if version is not None and version != self.state_version:
+            return True
+        try:
+            await asyncio.wait_for(self._state_changed.wait(), timeout)
+        except asyncio.TimeoutError:
+            return False
+        return True
@@ -0,0 +1,208 @@
+import logging
+import math
+from io import BytesIO
+
+logger = logging.getLogger("ImageTools")
+
+# Pillow is optional: without it frames are compared byte-for-byte and uploaded as-is
+try:
+    from PIL import Image, ImageDraw, ImageFont
+except ImportError:
+    Image = None
+
+PILLOW_AVAILABLE = Image is not None
+
+SIGNATURE_SIZE = 32 # Frames are compared as 32x32 grayscale thumbnails
+
+def frame_signature(jpg_data):
+    """
+    Returns a small grayscale thumbnail of a JPEG as bytes, or None if it can't be decoded.
+    Blocking; run it in an executor.
+    """
+    if Image is None:
+        return None
+    try:
+        img = Image.open(BytesIO(jpg_data))
+        # Let the JPEG decoder downscale via DCT scaling instead of decoding full size
+        img.draft('L', (SIGNATURE_SIZE * 8, SIGNATURE_SIZE * 8))
+        img = img.convert('L').resize((SIGNATURE_SIZE, SIGNATURE_SIZE), Image.BILINEAR)
+        return img.tobytes()
+    except Exception as e:
+        logger.debug(f"Failed to decode frame for signature: {e}")
+        return None
+
+def signature_difference(a, b, tolerance=20):
+    """
+    Percentage of thumbnail pixels whose brightness changed by more than `tolerance`.
+    Small tolerances are swallowed so sensor noise doesn't count as change.
+    """
+    if not a or not b or len(a) != len(b):
+        return 100.0
+    changed = sum(1 for x, y in zip(a, b) if abs(x - y) > tolerance)
+    return changed * 100.0 / len(a)
+
+def recompress_jpeg(jpg_data, max_width=None, quality=70):
+    """
+    Downscales a JPEG to at most `max_width` pixels wide and re-encodes it.
+    Returns the original bytes if Pillow is missing, decoding fails or nothing was saved.
+    Blocking; run it in an executor.
+    """
+    if Image is None:
+        return jpg_data
+    try:
+        img = Image.open(BytesIO(jpg_data))
+        width, height = img.size
+        if max_width and width > max_width:
+            target = (max_width, max(1, round(height * max_width / width)))
+            # Decode at the nearest power-of-two scale first, then resize the rest of the way
+            img.draft('RGB', target)
+            img = img.convert('RGB').resize(target, Image.BILINEAR)
+        else:
+            img = img.convert('RGB')
+
+        out = BytesIO()
+        img.save(out, 'JPEG', quality=int(quality or 70))
+        data = out.getvalue()
+        return data if len(data) < len(jpg_data) else jpg_data
+    except Exception as e:
+        logger.debug(f"Failed to recompress frame: {e}")
+        return jpg_data
+
+def compose_mosaic(tiles, tile_width=640, quality=75):
+    """
+    Lays out camera frames in a grid with a caption bar under each tile.
+    `tiles` is a list of (caption, jpeg bytes or None for offline cameras).
+    Returns the grid as JPEG bytes. Blocking; run it in an executor.
+    """
+    cols = max(1, math.ceil(math.sqrt(len(tiles))))
+    rows = max(1, math.ceil(len(tiles) / cols))
+    tile_height = tile_width * 9 // 16
+    caption_height = 22
+
+    canvas = Image.new('RGB', (cols * tile_width, rows * tile_height), (24, 24, 24))
+    draw = ImageDraw.Draw(canvas)
+    font = ImageFont.load_default()
+
+    for i, (caption, jpg_data) in enumerate(tiles):
+        x = (i % cols) * tile_width
+        y = (i // cols) * tile_height
+
+        frame = None
+        if jpg_data:
+            try:
+                frame = Image.open(BytesIO(jpg_data))
+                frame.draft('RGB', (tile_width, tile_height))
+                frame = frame.convert('RGB')
+                frame.thumbnail((tile_width, tile_height - caption_height), Image.BILINEAR)
+            except Exception as e:
+                logger.debug(f"Failed to decode mosaic tile {caption}: {e}")
+                frame = None
+
+        if frame:
+            canvas.paste(frame, (x + (tile_width - frame.width) // 2, y + (tile_height - caption_height - frame.height) // 2))
+        else:
+            text_width = draw.textlength("OFFLINE", font=font)
+            draw.text((x + (tile_width - text_width) // 2, y + (tile_height - caption_height) // 2), "OFFLINE", fill=(231, 76, 60), font=font)
+
+        draw.rectangle((x, y + tile_height - caption_height, x + tile_width - 1, y + tile_height - 1), fill=(0, 0, 0))
+        draw.text((x + 6, y + tile_height - caption_height + 5), caption, fill=(255, 255, 255), font=font)
+
+    out = BytesIO()
+    canvas.save(out, 'JPEG', quality=quality)
+    return out.getvalue()
+
+def evenly_spaced(items, count):
+    """
+    Picks at most `count` items spread evenly over `items`, always keeping the last one.
+    """
+    if len(items) <= count:
+        return list(items)
+    if count <= 1:
+        return [items[-1]]
+    step = (len(items) - 1) / (count - 1)
+    return [items[round(i * step)] for i in range(count)]
+
+def render_timelapse_gif(paths, width=480, max_frames=60, frame_ms=120):
+    """
+    Builds an animated GIF from JPEG files on disk, using at most `max_frames` of them.
+    Returns the GIF as bytes, or None. Blocking; run it in an executor.
+    """
+    frames = []
+    for path in evenly_spaced(paths, max_frames):
+        try:
+            with Image.open(path) as img:
+                height = max(1, round(img.height * width / img.width))
+                img.draft('RGB', (width, height))
+                frame = img.convert('RGB').resize((width, height), Image.BILINEAR)
+            frames.append(frame.quantize(colors=128))
+        except Exception as e:
+            logger.debug(f"Skipping timelapse frame {path}: {e}")
+
+    if not frames:
+        return None
+    out = BytesIO()
+    # Hold the finished print a little longer before looping
+    durations = [frame_ms] * (len(frames) - 1) + [frame_ms * 10]
+    frames[0].save(out, 'GIF', save_all=True, append_images=frames[1:], duration=durations, loop=0, optimize=True)
+    return out.getvalue()
+
+def render_contact_sheet(frames, count=16, tile_width=320):
+    """
+    Lays out up to `count` evenly spaced (path, caption) frames in a captioned grid.
+    Returns JPEG bytes. Blocking; run it in an executor.
+    """
+    tiles = []
+    for path, caption in evenly_spaced(frames, count):
+        try:
+            with open(path, 'rb') as f:
+                tiles.append((caption, f.read()))
+        except OSError:
+            tiles.append((caption, None))
+    return compose_mosaic(tiles, tile_width=tile_width)
+
+def render_history_chart(series, seconds, now, width=800, height=320):
+    """
+    Draws temperature lines (left scale, °C) and progress (right scale, %) over the
+    last `seconds`. `series` maps a field name to [(timestamp, value)]. Returns PNG bytes.
+    Blocking; run it in an executor.
+    """
+    colors = {'bed': (52, 152, 219), 'nozzle': (231, 76, 60), 'chamber': (241, 196, 15), 'progress': (46, 204, 113)}
+    left, right, top, bottom = 48, 48, 24, 28
+    plot_w = width - left - right
+    plot_h = height - top - bottom
+
+    canvas = Image.new('RGB', (width, height), (32, 34, 37))
+    draw = ImageDraw.Draw(canvas)
+    font = ImageFont.load_default()
+
+    temps = [v for field, points in series.items() if field != 'progress' for _, v in points]
+    temp_max = max(100.0, math.ceil(max(temps, default=0) / 100.0) * 100)
+
+    # Grid with °C labels on the left and % on the right
+    for step in range(5):
+        y = top + plot_h - plot_h * step / 4
+        draw.line((left, y, left + plot_w, y), fill=(60, 63, 68))
+        draw.text((4, y - 6), f"{temp_max * step / 4:.0f}°", fill=(185, 187, 190), font=font)
+        draw.text((left + plot_w + 6, y - 6), f"{25 * step}%", fill=(185, 187, 190), font=font)
+    hours = seconds / 3600
+    draw.text((left, top + plot_h + 8), f"-{hours:g}h", fill=(185, 187, 190), font=font)
+    draw.text((left + plot_w - 20, top + plot_h + 8), "now", fill=(185, 187, 190), font=font)
+
+    legend_x = left
+    for field, points in series.items():
+        color = colors.get(field, (255, 255, 255))
+        scale = 100.0 if field == 'progress' else temp_max
+        factor = 100.0 if field == 'progress' else 1.0
+        xy = [
+            (left + plot_w * (1 - (now - t) / seconds), top + plot_h - plot_h * min(v * factor / scale, 1.0))
+            for t, v in points
+        ]
+        if len(xy) > 1:
+            draw.line(xy, fill=color, width=2)
+        draw.rectangle((legend_x, 8, legend_x + 10, 18), fill=color)
+        draw.text((legend_x + 14, 7), field.title(), fill=(255, 255, 255), font=font)
+        legend_x += 90
+
+    out = BytesIO()
+    canvas.save(out, 'PNG')
+    return out.getvalue()
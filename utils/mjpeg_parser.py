@@ -0,0 +1,254 @@
+import logging
+
+logger = logging.getLogger("MJPEGParser")
+
+SOI = b'\xff\xd8'
+EOI = b'\xff\xd9'
+
+class _FrameBuffer:
+    """
+    Shared buffer handling for the MJPEG parsers.
+
+    Chunks are appended to one reusable bytearray that is compacted in place.
+    Frames are handed out as memoryview slices into that buffer: they are only
+    valid until the next call to feed(). Use bytes(frame) to keep a frame around.
+    """
+    def __init__(self, max_buffer=5 * 1024 * 1024):
+        self.max_buffer = max_buffer
+        self._buf = bytearray()
+        self._view = None
+        self._frames = []
+        self._consumed = 0  # Leading bytes of _buf that are no longer needed
+
+    def reset(self):
+        self._release()
+        self._buf = bytearray()
+        self._consumed = 0
+
+    def feed(self, chunk):
+        """
+        Appends a chunk and returns a list of the complete frames it finished.
+        """
+        self._append(chunk)
+        frames = self._parse()
+
+        if len(self._buf) - self._consumed > self.max_buffer:
+            logger.warning("MJPEG buffer overflow without a complete frame, resetting.")
+            frames.clear()
+            self.reset()
+
+        return frames
+
+    def _parse(self):
+        raise NotImplementedError
+
+    def _shift(self, consumed):
+        """Called after the first `consumed` bytes were dropped from the buffer."""
+        pass
+
+    def _slice(self, start, end):
+        if self._view is None:
+            self._view = memoryview(self._buf)
+        frame = self._view[start:end]
+        self._frames.append(frame)
+        return frame
+
+    def _release(self):
+        # Invalidate the frames handed out by the previous feed() so the buffer can be resized in place
+        for view in self._frames + [self._view]:
+            if view is None:
+                continue
+            try:
+                view.release()
+            except BufferError:
+                # Still exported by the caller; _append() falls back to a copy
+                pass
+        self._frames = []
+        self._view = None
+
+    def _append(self, chunk):
+        self._release()
+        consumed = self._consumed
+        try:
+            if consumed:
+                del self._buf[:consumed]
+            self._buf += chunk
+        except BufferError:
+            # A caller held on to a frame view; detach from it instead of failing
+            self._buf = self._buf[consumed:] + chunk
+
+        if consumed:
+            self._consumed = 0
+            self._shift(consumed)
+
+class MJPEGFrameExtractor(_FrameBuffer):
+    """
+    Splits an MJPEG byte stream into JPEG frames by scanning for SOI/EOI markers.
+
+    The marker search resumes where the previous chunk left off, so every byte
+    is scanned once. Used for servers that don't announce a multipart boundary.
+    """
+    def __init__(self, max_buffer=5 * 1024 * 1024):
+        super().__init__(max_buffer)
+        self._start = -1    # Offset of the SOI of the frame being assembled
+        self._scan = 0      # Offset where the next marker search resumes
+
+    def reset(self):
+        super().reset()
+        self._start = -1
+        self._scan = 0
+
+    def _shift(self, consumed):
+        self._scan -= consumed
+        if self._start >= 0:
+            self._start -= consumed
+
+    def _parse(self):
+        frames = []
+        buf = self._buf
+        while True:
+            if self._start < 0:
+                a = buf.find(SOI, self._scan)
+                if a == -1:
+                    # Keep the last byte in case it is the first half of a marker
+                    self._consumed = max(self._consumed, len(buf) - 1)
+                    self._scan = self._consumed
+                    break
+                self._start = a
+                self._scan = a + 2
+
+            b = buf.find(EOI, self._scan)
+            if b == -1:
+                self._scan = max(self._start + 2, len(buf) - 1)
+                break
+
+            frames.append(self._slice(self._start, b + 2))
+            self._consumed = self._scan = b + 2
+            self._start = -1
+
+        return frames
+
+class MultipartMJPEGParser(_FrameBuffer):
+    """
+    Splits a multipart/x-mixed-replace stream into parts using its boundary.
+
+    Parts that carry a Content-Length are cut by length without looking at the
+    JPEG data, so nested markers (e.g. EXIF thumbnails) can't end a frame early.
+    Parts without one end at the next boundary delimiter.
+    """
+    MAX_HEADER_SIZE = 8192
+
+    # Parser states
+    SEEK_BOUNDARY = 0
+    HEADERS = 1
+    BODY = 2
+
+    def __init__(self, boundary, max_buffer=5 * 1024 * 1024):
+        super().__init__(max_buffer)
+        if isinstance(boundary, str):
+            boundary = boundary.encode('latin-1')
+        # Some servers announce the boundary with the leading dashes already included
+        self.delimiter = b'--' + boundary.lstrip(b'-')
+        self._state = self.SEEK_BOUNDARY
+        self._pos = 0         # Offset where the next search resumes
+        self._body_start = 0
+        self._length = None   # Content-Length of the current part, if announced
+
+    def reset(self):
+        super().reset()
+        self._state = self.SEEK_BOUNDARY
+        self._pos = 0
+        self._body_start = 0
+        self._length = None
+
+    def _shift(self, consumed):
+        self._pos -= consumed
+        self._body_start -= consumed
+
+    def _parse(self):
+        frames = []
+        buf = self._buf
+        while True:
+            if self._state == self.SEEK_BOUNDARY:
+                i = buf.find(self.delimiter, self._pos)
+                if i == -1:
+                    # Keep enough bytes to match a delimiter split across chunks
+                    self._pos = max(self._pos, len(buf) - len(self.delimiter) + 1)
+                    self._consumed = self._pos
+                    break
+                self._pos = i + len(self.delimiter)
+                self._consumed = i
+                self._state = self.HEADERS
+
+            if self._state == self.HEADERS:
+                end = buf.find(b'\r\n\r\n', self._pos)
+                if end == -1:
+                    if len(buf) - self._pos > self.MAX_HEADER_SIZE:
+                        logger.warning("Multipart headers too large, resyncing on boundary.")
+                        self._state = self.SEEK_BOUNDARY
+                        continue
+                    break
+                self._length = self._content_length(buf[self._pos:end])
+                self._body_start = self._pos = end + 4
+                self._state = self.BODY
+
+            if self._length is not None:
+                body_end = self._body_start + self._length
+                if len(buf) < body_end:
+                    break
+                self._pos = body_end
+                self._state = self.SEEK_BOUNDARY
+            else:
+                i = buf.find(self.delimiter, self._pos)
+                if i == -1:
+                    self._pos = max(self._pos, len(buf) - len(self.delimiter) + 1)
+                    break
+                body_end = i
+                if buf[body_end - 2:body_end] == b'\r\n':
+                    body_end -= 2
+                # The delimiter we just found opens the next part
+                self._pos = i + len(self.delimiter)
+                self._state = self.HEADERS
+
+            if buf[self._body_start:self._body_start + 2] == SOI:
+                frames.append(self._slice(self._body_start, body_end))
+            else:
+                logger.debug("Skipping non-JPEG multipart part.")
+            self._consumed = body_end
+
+        return frames
+
+    @staticmethod
+    def _content_length(header_block):
+        for line in bytes(header_block).split(b'\r\n'):
+            name, sep, value = line.partition(b':')
+            if sep and name.strip().lower() == b'content-length':
+                try:
+                    return int(value.strip())
+                except ValueError:
+                    return None
+        return None
+
+def parse_boundary(content_type):
+    """
+    Returns the boundary of a multipart Content-Type header, or None.
+    """
+    if not content_type or not content_type.lower().startswith('multipart/'):
+        return None
+    for param in content_type.split(';')[1:]:
+        name, sep, value = param.partition('=')
+        if sep and name.strip().lower() == 'boundary':
+            value = value.strip().strip('"')
+            if value.lstrip('-'):
+                return value
+    return None
+
+def create_frame_parser(content_type=None):
+    """
+    Picks the multipart parser when the response announces a boundary and falls
+    back to SOI/EOI marker scanning otherwise.
+    """
+    boundary = parse_boundary(content_type)
+    if boundary:
+        return MultipartMJPEGParser(boundary)
+    return MJPEGFrameExtractor()
@@ -0,0 +1,145 @@
+import json
+import logging
+import time
+
+from utils.printer_socket import PrinterSocket
+
+logger = logging.getLogger("MoonrakerClient")
+
+# Objects and the fields of each that printer.objects.subscribe pushes to us
+SUBSCRIBE_OBJECTS = {
+    "print_stats": ["state", "filename", "print_duration", "info"],
+    "display_status": ["progress"],
+    "heater_bed": ["temperature", "target"],
+    "extruder": ["temperature", "target"],
+}
+
+def merge_status(snapshot, update):
+    """
+    Applies a partial notify_status_update to the snapshot in place.
+    Moonraker only sends the fields that changed, one level below each object.
+    """
+    for obj, fields in update.items():
+        if isinstance(fields, dict):
+            snapshot.setdefault(obj, {}).update(fields)
+    return snapshot
+
+class MoonrakerClient(PrinterSocket):
+    """
+    Subscribes to the print status of a Moonraker (Klipper) host over its
+    JSON-RPC WebSocket. `connected` is set once the subscription is answered.
+    """
+    PROTOCOL = "Moonraker"
+    HEARTBEAT = 20           # WebSocket ping interval
+    REQUEST_TIMEOUT = 10     # Seconds to wait for the subscribe reply
+
+    def __init__(self, base_url, session=None):
+        self.base_url = base_url.rstrip('/')
+        if self.base_url.startswith("https://"):
+            ws_url = "wss://" + self.base_url[len("https://"):] + "/websocket"
+        else:
+            ws_url = "ws://" + self.base_url.split("://")[-1] + "/websocket"
+        super().__init__(ws_url, self.base_url, session=session)
+        self.objects = {}        # Raw subscribed objects, kept up to date by notifications
+        self.status = {}
+        self.status_time = 0     # time.monotonic() of the last update
+        self._next_id = 1
+        self._subscribe_id = None
+
+    async def fetch_status(self):
+        """
+        Returns the latest status pushed by Moonraker without touching the network.
+        Returns {} while disconnected / before the subscription was answered.
+        """
+        self.start()
+        if self.connected and self.status:
+            return self.status
+        return {}
+
+    async def _subscribe(self, ws):
+        self._subscribe_id = self._next_id
+        self._next_id += 1
+        await ws.send_json({
+            "jsonrpc": "2.0",
+            "method": "printer.objects.subscribe",
+            "params": {"objects": SUBSCRIBE_OBJECTS},
+            "id": self._subscribe_id
+        })
+
+    async def _listen(self, ws):
+        await self._subscribe(ws)
+        subscribed_at = time.monotonic()
+        while True:
+            text = await self._receive(ws)
+            if text is not None and await self._handle_message(ws, text):
+                subscribed_at = time.monotonic()
+
+            if not self.connected and time.monotonic() - subscribed_at > self.REQUEST_TIMEOUT:
+                logger.warning(f"Moonraker {self.base_url} didn't answer the subscription, reconnecting.")
+                return
+
+    async def _handle_message(self, ws, text):
+        """
+        Processes one JSON-RPC message. Returns True if a new subscription was sent.
+        """
+        try:
+            data = json.loads(text)
+        except ValueError:
+            return False
+        if not isinstance(data, dict):
+            return False
+
+        if data.get('id') is not None and data.get('id') == self._subscribe_id:
+            if 'error' in data:
+                # Usually Klippy isn't ready yet; notify_klippy_ready will resubscribe
+                logger.warning(f"Moonraker subscribe failed for {self.base_url}: {data['error']}")
+                return False
+            self.objects = {}
+            merge_status(self.objects, data.get('result', {}).get('status', {}))
+            self._update_status()
+            self.connected = True
+            return False
+
+        method = data.get('method')
+        if method == "notify_status_update":
+            params = data.get('params') or [{}]
+            if isinstance(params[0], dict):
+                merge_status(self.objects, params[0])
+                self._update_status()
+        elif method == "notify_klippy_ready":
+            # Klipper restarted; the old subscription is gone
+            await self._subscribe(ws)
+            return True
+        elif method in ("notify_klippy_shutdown", "notify_klippy_disconnected"):
+            self.objects.setdefault('print_stats', {})['state'] = "error" if method == "notify_klippy_shutdown" else "offline"
+            self._update_status()
+        return False
+
+    def _update_status(self):
+        """
+        Converts the subscribed objects into the status dict used by StreamBot.
+        """
+        stats = self.objects.get('print_stats', {})
+        display = self.objects.get('display_status', {})
+        result = {
+            'filename': stats.get('filename'),
+            'print_duration': stats.get('print_duration'),
+            'state': stats.get('state') or "standby",
+            'progress': display.get('progress', 0) or 0
+        }
+        # Only reported when the slicer emits SET_PRINT_STATS_INFO
+        info = stats.get('info') or {}
+        if info.get('current_layer') is not None:
+            result['layer'] = info.get('current_layer')
+            result['total_layers'] = info.get('total_layer')
+
+        temps = {}
+        for name, key in (('heater_bed', 'bed'), ('extruder', 'nozzle')):
+            heater = self.objects.get(name)
+            if heater and heater.get('temperature') is not None:
+                temps[key] = (heater.get('temperature', 0), heater.get('target', 0))
+        if temps:
+            result['temps'] = temps
+
+        self.status = result
+        self.status_time = time.monotonic()
@@ -0,0 +1,32 @@
+import json
+import os
+import logging
+
+logger = logging.getLogger("PrinterCache")
+
+CACHE_FILE = "data/printer_cache.json"
+
+def load_printer_cache():
+    """
+    Returns {host: {'mainboard_id', 'attributes', 'protocol', 'detected_at'}}
+    remembered from the previous run.
+    """
+    if not os.path.exists(CACHE_FILE):
+        return {}
+    try:
+        with open(CACHE_FILE, 'r') as f:
+            data = json.load(f)
+            return data if isinstance(data, dict) else {}
+    except (json.JSONDecodeError, OSError) as e:
+        logger.error(f"Failed to load printer cache: {e}")
+        return {}
+
+def save_printer_cache(cache):
+    os.makedirs(os.path.dirname(CACHE_FILE), exist_ok=True)
+    tmp_file = f"{CACHE_FILE}.tmp"
+    try:
+        with open(tmp_file, 'w') as f:
+            json.dump(cache, f, indent=4)
+        os.replace(tmp_file, CACHE_FILE)
+    except OSError as e:
+        logger.error(f"Failed to save printer cache: {e}")
@@ -0,0 +1,123 @@
+import math
+import time
+from array import array
+
+SPARK_CHARS = "▁▂▃▄▅▆▇█"
+
+class PrinterHistory:
+    """
+    Fixed-size ring buffer of a printer's temperatures and progress.
+
+    Every field is a preallocated array('f') (timestamps are array('d')), so a
+    sample costs a few bytes and appending is O(1) no matter how long the bot
+    runs. Missing values are stored as NaN and skipped by the aggregates.
+    """
+    FIELDS = ('bed', 'nozzle', 'chamber', 'progress')
+
+    def __init__(self, capacity=1440, sample_interval=10.0):
+        self.capacity = capacity
+        self.sample_interval = sample_interval # Minimum seconds between samples
+        self.times = array('d', [0.0]) * capacity
+        self.values = {field: array('f', [math.nan]) * capacity for field in self.FIELDS}
+        self.count = 0
+        self._next = 0 # Index the next sample is written to
+
+    def append(self, timestamp, **values):
+        """
+        Stores one sample, overwriting the oldest when full. Unknown fields are ignored.
+        """
+        i = self._next
+        self.times[i] = timestamp
+        for field in self.FIELDS:
+            value = values.get(field)
+            self.values[field][i] = math.nan if value is None else value
+        self._next = (i + 1) % self.capacity
+        self.count = min(self.count + 1, self.capacity)
+
+    def record_status(self, status, now=None):
+        """
+        Samples a StreamBot status dict, at most once per `sample_interval`.
+        Returns True if a sample was stored.
+        """
+        now = time.time() if now is None else now
+        if self.count and now - self.last_time() < self.sample_interval:
+            return False
+
+        temps = status.get('temps') or {}
+        values = {
+            'progress': _to_float(status.get('progress')),
+            'chamber': _to_float(temps.get('chamber'))
+        }
+        for field in ('bed', 'nozzle'):
+            reading = temps.get(field)
+            if reading:
+                values[field] = _to_float(reading[0])
+        self.append(now, **values)
+        return True
+
+    def last_time(self):
+        return self.times[(self._next - 1) % self.capacity] if self.count else 0.0
+
+    def _indices(self, seconds=None, now=None):
+        # Oldest to newest, only samples inside the window. Walks back from the
+        # newest sample and stops at the cutoff, so small windows stay cheap.
+        cutoff = None
+        if seconds is not None:
+            cutoff = (time.time() if now is None else now) - seconds
+        indices = []
+        for n in range(1, self.count + 1):
+            i = (self._next - n) % self.capacity
+            if cutoff is not None and self.times[i] < cutoff:
+                break
+            indices.append(i)
+        return reversed(indices)
+
+    def series(self, field, seconds=None, now=None):
+        """
+        Returns [(timestamp, value)] for `field` within the last `seconds`, oldest first.
+        """
+        data = self.values[field]
+        return [(self.times[i], data[i]) for i in self._indices(seconds, now) if not math.isnan(data[i])]
+
+    def aggregate(self, field, seconds=None, now=None):
+        """
+        Returns (min, max, mean) of `field` within the last `seconds`, or None without samples.
+        """
+        data = self.values[field]
+        low, high, total, n = math.inf, -math.inf, 0.0, 0
+        for i in self._indices(seconds, now):
+            value = data[i]
+            if math.isnan(value):
+                continue
+            low = min(low, value)
+            high = max(high, value)
+            total += value
+            n += 1
+        if not n:
+            return None
+        return low, high, total / n
+
+def sparkline(values, width=30):
+    """
+    Renders values as a line of block characters, averaging them into `width` buckets.
+    """
+    if not values:
+        return ""
+    if len(values) > width:
+        buckets = []
+        for b in range(width):
+            chunk = values[b * len(values) // width:(b + 1) * len(values) // width]
+            buckets.append(sum(chunk) / len(chunk))
+        values = buckets
+
+    low, high = min(values), max(values)
+    span = high - low
+    if span == 0:
+        return SPARK_CHARS[0] * len(values)
+    return "".join(SPARK_CHARS[int((v - low) / span * (len(SPARK_CHARS) - 1))] for v in values)
+
+def _to_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
@@ -0,0 +1,50 @@
+import time
+
+MOONRAKER = "moonraker"
+SDCP = "sdcp"
+NONE = "none"
+
+class PrinterProtocolCache:
+    """
+    Remembers which status protocol each printer host speaks.
+
+    A detection result is trusted until its TTL expires or the protocol fails
+    `max_failures` times in a row; only then is the printer probed again.
+    Printers that answered nothing are re-probed sooner (`none_ttl`).
+    """
+    def __init__(self, ttl=3600, none_ttl=300, max_failures=5):
+        self.ttl = ttl
+        self.none_ttl = none_ttl
+        self.max_failures = max_failures
+        self.entries = {}
+
+    def get(self, host):
+        """
+        Returns the cached protocol for `host`, or None if it needs to be (re)detected.
+        """
+        entry = self.entries.get(host)
+        if not entry:
+            return None
+
+        ttl = self.none_ttl if entry['protocol'] == NONE else self.ttl
+        if time.monotonic() - entry['checked'] > ttl or entry['failures'] >= self.max_failures:
+            return None
+        return entry['protocol']
+
+    def set(self, host, protocol, detected_at=None):
+        self.entries[host] = {
+            'protocol': protocol,
+            'checked': time.monotonic(),
+            'detected_at': detected_at or time.time(),
+            'failures': 0
+        }
+
+    def record_success(self, host):
+        entry = self.entries.get(host)
+        if entry:
+            entry['failures'] = 0
+
+    def record_failure(self, host):
+        entry = self.entries.get(host)
+        if entry:
+            entry['failures'] += 1
@@ -0,0 +1,112 @@
+import asyncio
+import aiohttp
+import logging
+
+CLOSE_TYPES = (aiohttp.WSMsgType.CLOSE, aiohttp.WSMsgType.CLOSING,
+               aiohttp.WSMsgType.CLOSED, aiohttp.WSMsgType.ERROR)
+
+class SocketClosed(Exception):
+    pass
+
+class PrinterSocket:
+    """
+    Keeps one WebSocket to a printer open in a background task, reconnecting
+    with backoff, so reading the status never waits on the network.
+
+    Subclasses implement _listen(ws), which handles messages until the
+    connection should be dropped, and may override _prepare() to do work
+    (e.g. discovery) before each connection attempt. `connected` is set by the
+    subclass once the printer is actually delivering status.
+    """
+    PROTOCOL = "WebSocket"   # Name used in log messages
+    HEADERS = None
+    HEARTBEAT = None         # aiohttp ping interval in seconds, None to disable
+    CONNECT_TIMEOUT = 10
+
+    def __init__(self, ws_url, target, session=None):
+        self.ws_url = ws_url
+        self.target = target     # Host or URL shown in log messages
+        self.session = session   # Shared aiohttp session (optional)
+        self.connected = False
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self._task = None
+        self._own_session = None
+
+    def start(self):
+        """
+        Starts the background connection if it isn't running yet.
+        """
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def close(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except (asyncio.CancelledError, Exception):
+                pass
+            self._task = None
+        if self._own_session:
+            await self._own_session.close()
+            self._own_session = None
+
+    async def _prepare(self):
+        """
+        Called before every connection attempt. Return False to skip this attempt.
+        """
+        return True
+
+    async def _listen(self, ws):
+        raise NotImplementedError
+
+    async def _receive(self, ws, timeout=5.0):
+        """
+        Returns the next text message, or None if nothing arrived within `timeout`
+        seconds. Raises SocketClosed once the connection is gone.
+        """
+        try:
+            msg = await ws.receive(timeout=timeout)
+        except asyncio.TimeoutError:
+            return None
+        if msg.type == aiohttp.WSMsgType.TEXT:
+            return msg.data
+        if msg.type in CLOSE_TYPES:
+            raise SocketClosed()
+        return None
+
+    def _get_session(self):
+        if self.session and not self.session.closed:
+            return self.session
+        if self._own_session is None or self._own_session.closed:
+            self._own_session = aiohttp.ClientSession()
+        return self._own_session
+
+    async def _run(self):
+        backoff = 1
+        while True:
+            try:
+                if await self._prepare():
+                    session = self._get_session()
+                    ws = await asyncio.wait_for(
+                        session.ws_connect(self.ws_url, headers=self.HEADERS, heartbeat=self.HEARTBEAT),
+                        timeout=self.CONNECT_TIMEOUT
+                    )
+                    async with ws:
+                        backoff = 1
+                        self.logger.info(f"{self.PROTOCOL} connected to {self.target}")
+                        try:
+                            await self._listen(ws)
+                        except SocketClosed:
+                            pass
+                    self.logger.info(f"{self.PROTOCOL} connection to {self.target} closed")
+
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.logger.error(f"{self.PROTOCOL} WebSocket error {self.target}: {e}")
+            finally:
+                self.connected = False
+
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, 60)
@@ -1,186 +1,340 @@
 import asyncio
-import aiohttp
 import json
 import logging
 import uuid
 import time
-import socket
+
+from utils.printer_socket import PrinterSocket
 
 logger = logging.getLogger("SDCPClient")
 
-class SDCPClient:
-    def __init__(self, host, port=3030):
+SDCP_DISCOVERY_PORT = 3000
+DISCOVERY_MESSAGE = b"M99999"
+DISCOVERY_BACKOFF_BASE = 10   # Seconds before retrying a printer that didn't answer
+DISCOVERY_BACKOFF_MAX = 300
+
+def parse_discovery_reply(data):
+    """
+    Returns the printer info dict of an M99999 reply, or None.
+    """
+    text = data.decode('utf-8', errors='ignore').strip()
+    if not text.startswith('{'):
+        return None
+    try:
+        j = json.loads(text)
+    except ValueError:
+        return None
+
+    info = j.get('Data') if isinstance(j.get('Data'), dict) else j
+    if not info.get('MainboardID'):
+        return None
+    return info
+
+class _DiscoveryProtocol(asyncio.DatagramProtocol):
+    def __init__(self, on_reply, on_error=None):
+        self.on_reply = on_reply
+        self.on_error = on_error
+
+    def datagram_received(self, data, addr):
+        info = parse_discovery_reply(data)
+        if info:
+            self.on_reply(addr[0], info)
+
+    def error_received(self, exc):
+        # e.g. ICMP port unreachable when the host is up but isn't an SDCP printer
+        logger.debug(f"UDP discovery error: {exc}")
+        if self.on_error:
+            self.on_error(exc)
+
+async def query_printer(host, timeout=3.0):
+    """
+    Asks a single printer for its discovery info. Returns None if it doesn't answer.
+    """
+    loop = asyncio.get_running_loop()
+    reply = loop.create_future()
+
+    def on_reply(ip, info):
+        if not reply.done():
+            reply.set_result(info)
+
+    def on_error(exc):
+        if not reply.done():
+            reply.set_result(None)
+
+    transport, _ = await loop.create_datagram_endpoint(
+        lambda: _DiscoveryProtocol(on_reply, on_error),
+        remote_addr=(host, SDCP_DISCOVERY_PORT)
+    )
+    try:
+        transport.sendto(DISCOVERY_MESSAGE)
+        return await asyncio.wait_for(reply, timeout)
+    except asyncio.TimeoutError:
+        return None
+    finally:
+        transport.close()
+
+async def discover_printers(address="255.255.255.255", timeout=3.0):
+    """
+    Broadcasts one M99999 packet and collects every printer that answers.
+    Returns {ip: info}.
+    """
+    loop = asyncio.get_running_loop()
+    found = {}
+
+    transport, _ = await loop.create_datagram_endpoint(
+        lambda: _DiscoveryProtocol(lambda ip, info: found.setdefault(ip, info)),
+        local_addr=('0.0.0.0', 0),
+        allow_broadcast=True
+    )
+    try:
+        transport.sendto(DISCOVERY_MESSAGE, (address, SDCP_DISCOVERY_PORT))
+        await asyncio.sleep(timeout)
+    finally:
+        transport.close()
+
+    return found
+
+class SDCPClient(PrinterSocket):
+    """
+    Caches the status frames an Elegoo SDCP printer pushes over its WebSocket.
+    The MainboardID needed for requests is discovered over UDP before connecting.
+    """
+    PROTOCOL = "SDCP"
+    HEADERS = {"User-Agent": "Mozilla/5.0"}
+    HEARTBEAT_INTERVAL = 20  # Seconds between "ping" frames
+    REFRESH_INTERVAL = 30    # Re-request status if the printer hasn't pushed one
+    STALE_AFTER = 90         # Seconds without any message before reconnecting
+
+    def __init__(self, host, port=3030, session=None, on_discovery=None):
+        super().__init__(f"ws://{host}:{port}/websocket", host, session=session)
         self.host = host
+        self.on_discovery = on_discovery # Called with the client after a successful discovery
         self.port = port
         self.mainboard_id = None
-        self.ws_url = f"ws://{host}:{port}/websocket"
         self.status = {}
-        
-    async def discover_mainboard_id(self):
+        self.status_time = 0     # time.monotonic() of the last status frame
+        self.attributes = {}     # Raw discovery reply (name, firmware, ...)
+        self._discovery_failures = 0
+        self._discovery_retry_at = 0
+        self._revalidate = False # Set when the printer rejects/ignores our MainboardID
+
+    async def discover_mainboard_id(self, force=False):
         """
         Sends a UDP unicast packet to the host to get the MainboardID.
+        Failed lookups are retried with exponential backoff unless `force` is set.
         """
+        if not force and time.monotonic() < self._discovery_retry_at:
+            return None
+
         try:
-            loop = asyncio.get_running_loop()
-            
-            def _udp_query():
-                sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-                sock.settimeout(3.0) 
-                try:
-                    message = b"M99999"
-                    target = (self.host, 3000)
-                    sock.sendto(message, target)
-                    data, _ = sock.recvfrom(4096)
-                    return data
-                except Exception as e:
-                    # logger.debug(f"UDP discovery failed: {e}")
-                    return None
-                finally:
-                    sock.close()
-
-            data = await loop.run_in_executor(None, _udp_query)
-            
-            if data:
-                text = data.decode('utf-8', errors='ignore')
-                if text.strip().startswith('{'):
-                    j = json.loads(text)
-                    self.mainboard_id = j.get('Data', {}).get('MainboardID') or j.get('MainboardID')
-                    if self.mainboard_id:
-                        logger.info(f"Discovered MainboardID for {self.host}: {self.mainboard_id}")
-                        return self.mainboard_id
+            info = await query_printer(self.host)
+            if info:
+                self.apply_discovery(info)
+                logger.info(f"Discovered MainboardID for {self.host}: {self.mainboard_id}")
+                return self.mainboard_id
 
         except Exception as e:
             logger.error(f"Async UDP error: {e}")
-            
+
+        self._discovery_failures += 1
+        delay = min(DISCOVERY_BACKOFF_BASE * 2 ** (self._discovery_failures - 1), DISCOVERY_BACKOFF_MAX)
+        self._discovery_retry_at = time.monotonic() + delay
+        logger.debug(f"UDP discovery failed for {self.host}, retrying in {delay}s")
         return None
 
+    def apply_discovery(self, info):
+        """
+        Stores a discovery reply (from unicast or a broadcast sweep).
+        """
+        self.mainboard_id = info.get('MainboardID')
+        self.attributes = info
+        self._discovery_failures = 0
+        self._discovery_retry_at = 0
+        if self.on_discovery:
+            self.on_discovery(self)
+
+    def load_cached(self, mainboard_id, attributes=None):
+        """
+        Uses a MainboardID remembered from a previous run without rediscovering it.
+        It is only re-validated if the printer rejects or ignores our requests.
+        """
+        self.mainboard_id = mainboard_id
+        self.attributes = attributes or {}
+
     async def fetch_status(self):
         """
-        Connects via WebSocket, requests status, waits for response, and closes.
-        Returns a dict with 'filename', 'print_duration', 'state', 'progress'.
+        Returns the latest status pushed by the printer without touching the network.
+        Returns a dict with 'filename', 'print_duration', 'state', 'progress',
+        or {} while disconnected / before the first status arrived.
         """
+        self.start()
+        if self.status and time.monotonic() - self.status_time < self.STALE_AFTER:
+            return self.status
+        return {}
+
+    async def _prepare(self):
         if not self.mainboard_id:
             await self.discover_mainboard_id()
-            if not self.mainboard_id:
-                return {}
+        elif self._revalidate:
+            # Keep the old ID if the printer is too busy to answer discovery
+            self._revalidate = False
+            await self.discover_mainboard_id(force=True)
+        return bool(self.mainboard_id)
+
+    async def _listen(self, ws):
+        self.connected = True
+        await self._send_status_request(ws)
+        now = time.monotonic()
+        last_heard = last_ping = last_request = now
+
+        while True:
+            text = await self._receive(ws)
+            now = time.monotonic()
+            if text is not None:
+                last_heard = now
+                if text != "pong":
+                    self._handle_message(text)
+
+            if now - last_heard > self.STALE_AFTER:
+                logger.warning(f"SDCP printer {self.host} went silent, reconnecting.")
+                return
+
+            # Heartbeat keeps the printer (and any NAT in between) from dropping the socket
+            if now - last_ping >= self.HEARTBEAT_INTERVAL:
+                await ws.send_str("ping")
+                last_ping = now
 
-        headers = {"User-Agent": "Mozilla/5.0"}
-        result = {}
+            if self._revalidate:
+                return
 
+            # The printer pushes on change; ask explicitly if it has been quiet for a while
+            if now - self.status_time >= self.REFRESH_INTERVAL and now - last_request >= self.REFRESH_INTERVAL:
+                if self.status_time < last_request:
+                    # Our last request went unanswered, the MainboardID may be stale
+                    logger.warning(f"SDCP printer {self.host} ignored status request, revalidating MainboardID.")
+                    self._revalidate = True
+                    return
+                await self._send_status_request(ws)
+                last_request = now
+
+    async def _send_status_request(self, ws):
+        uuid_str = str(uuid.uuid4())
+        payload = {
+            "Id": uuid_str,
+            "Data": {
+                "Cmd": 0,
+                "Data": {},
+                "RequestID": uuid_str,
+                "MainboardID": self.mainboard_id,
+                "TimeStamp": int(time.time()),
+                "From": 0 
+            },
+            "Topic": f"sdcp/request/{self.mainboard_id}"
+        }
+        await ws.send_json(payload)
+
+    def _handle_message(self, text):
         try:
-            timeout = aiohttp.ClientTimeout(total=10)
-            async with aiohttp.ClientSession(headers=headers, timeout=timeout) as session:
-                async with session.ws_connect(self.ws_url) as ws:
-                    
-                    uuid_str = str(uuid.uuid4())
-                    ts = int(time.time())
-                    topic = f"sdcp/request/{self.mainboard_id}"
-                    
-                    payload = {
-                        "Id": uuid_str,
-                        "Data": {
-                            "Cmd": 0,
-                            "Data": {},
-                            "RequestID": uuid_str,
-                            "MainboardID": self.mainboard_id,
-                            "TimeStamp": ts,
-                            "From": 0 
-                        },
-                        "Topic": topic
-                    }
-                    
-                    await ws.send_json(payload)
-                    
-                    start_time = time.time()
-                    while time.time() - start_time < 5.0:
-                        try:
-                            msg = await ws.receive(timeout=1.0)
-                            
-                            if msg.type == aiohttp.WSMsgType.TEXT:
-                                data = json.loads(msg.data)
-                                logger.debug(f"SDCP Raw Data: {data}")
-                                
-                                if 'Status' in data and 'PrintInfo' in data['Status']:
-                                    status_data = data['Status']
-                                    print_info = status_data.get('PrintInfo', {})
-                                    
-                                    status_code = print_info.get('Status', 0)
-                                    
-                                    # Detailed Status Mapping
-                                    # Based on observation and common SDCP usage
-                                    STATUS_MAP = {
-                                        0: "Idle",
-                                        1: "Printing",
-                                        2: "Paused",
-                                        3: "Error",
-                                        4: "Transferring",
-                                        9: "Complete", # Observed "Print Complete"
-                                        13: "Printing",  # Observed during active print
-                                        16: "Starting", # Observed "Heating/Stabilizing"
-                                        20: "Auto-Leveling", # Observed "Automatic Leveling"
-                                        21: "Parking" # Observed "Parking Toolhead"
-                                    }
-                                    
-                                    state = STATUS_MAP.get(status_code, f"Status {status_code}")
-                                    
-                                    # Refine "Printing" or "Starting" with Temperature Data
-                                    if state in ["Printing", "Starting", "Status 16"]:
-                                        # Check Temperatures
-                                        bed_curr = status_data.get('TempOfHotbed', 0)
-                                        bed_target = status_data.get('TempTargetHotbed', 0)
-                                        nozzle_curr = status_data.get('TempOfNozzle', 0)
-                                        nozzle_target = status_data.get('TempTargetNozzle', 0)
-                                        
-                                        # Heuristic: If target > 0 and we are not close to it, we are heating
-                                        if bed_target > 0 and abs(bed_curr - bed_target) > 5:
-                                            state = "Heating Bed"
-                                        elif nozzle_target > 0 and abs(nozzle_curr - nozzle_target) > 5:
-                                            state = "Heating Nozzle"
-                                            
-                                    result = {
-                                        'filename': print_info.get('Filename', ''),
-                                        'print_duration': print_info.get('CurrentTicks', 0),
-                                        'total_duration': print_info.get('TotalTicks', 0),
-                                        'state': state,
-                                        'progress': 0,
-                                        'meta': status_data,
-                                        'temps': {
-                                            'bed': (status_data.get('TempOfHotbed', 0), status_data.get('TempTargetHotbed', 0)),
-                                            'nozzle': (status_data.get('TempOfNozzle', 0), status_data.get('TempTargetNozzle', 0)),
-                                            'chamber': status_data.get('TempOfCase', 0) # 'TempOfCase' is common for Chamber
-                                        }
-                                    }
-                                    
-                                    # Clear stats if Idle to prevent stale data
-                                    if state == "Idle":
-                                        result['progress'] = 0
-                                        result['print_duration'] = 0
-                                        result['total_duration'] = 0
-                                    
-                                    if result['total_duration'] > 0:
-                                        result['progress'] = result['print_duration'] / result['total_duration']
-                                    elif print_info.get('TotalLayer', 0) > 0:
-                                        result['progress'] = print_info.get('CurrentLayer', 0) / print_info.get('TotalLayer')
-                                    else:
-                                        # Fallback to raw progress if nothing else works (e.g. at start)
-                                        raw_prog = print_info.get('Progress', 0)
-                                        if raw_prog > 0:
-                                            result['progress'] = raw_prog / 100.0
-                                    
-                                    # Force 100% if Complete
-                                    if state == "Complete":
-                                        result['progress'] = 1.0
-                                        if result['total_duration'] > 0:
-                                            result['print_duration'] = result['total_duration']
-                                        
-                                    return result
-                                    
-                            elif msg.type in (aiohttp.WSMsgType.CLOSED, aiohttp.WSMsgType.ERROR):
-                                break
-                        except asyncio.TimeoutError:
-                            continue
-                            
-        except Exception as e:
-            logger.error(f"SDCP WebSocket error {self.host}: {e}")
-            
-        return result
+            data = json.loads(text)
+        except ValueError:
+            return
+        if not isinstance(data, dict):
+            return
+        logger.debug(f"SDCP Raw Data: {data}")
+
+        # Responses carry an Ack code; anything but 0 means the request was rejected
+        if str(data.get('Topic', '')).startswith('sdcp/response/'):
+            response = (data.get('Data') or {}).get('Data')
+            ack = response.get('Ack', 0) if isinstance(response, dict) else 0
+            if ack != 0:
+                logger.warning(f"SDCP printer {self.host} rejected request (Ack {ack}), revalidating MainboardID.")
+                self._revalidate = True
+            return
+
+        result = self._parse_status(data)
+        if result:
+            self.status = result
+            self.status_time = time.monotonic()
+
+    def _parse_status(self, data):
+        """
+        Converts an sdcp/status message into the status dict used by StreamBot.
+        Returns None for other messages.
+        """
+        if 'Status' in data and 'PrintInfo' in data['Status']:
+            status_data = data['Status']
+            print_info = status_data.get('PrintInfo', {})
+
+            status_code = print_info.get('Status', 0)
+
+            # Detailed Status Mapping
+            # Based on observation and common SDCP usage
+            STATUS_MAP = {
+                0: "Idle",
+                1: "Printing",
+                2: "Paused",
+                3: "Error",
+                4: "Transferring",
+                9: "Complete", # Observed "Print Complete"
+                13: "Printing",  # Observed during active print
+                16: "Starting", # Observed "Heating/Stabilizing"
+                20: "Auto-Leveling", # Observed "Automatic Leveling"
+                21: "Parking" # Observed "Parking Toolhead"
+            }
+
+            state = STATUS_MAP.get(status_code, f"Status {status_code}")
+
+            # Refine "Printing" or "Starting" with Temperature Data
+            if state in ["Printing", "Starting", "Status 16"]:
+                # Check Temperatures
+                bed_curr = status_data.get('TempOfHotbed', 0)
+                bed_target = status_data.get('TempTargetHotbed', 0)
+                nozzle_curr = status_data.get('TempOfNozzle', 0)
+                nozzle_target = status_data.get('TempTargetNozzle', 0)
+
+                # Heuristic: If target > 0 and we are not close to it, we are heating
+                if bed_target > 0 and abs(bed_curr - bed_target) > 5:
+                    state = "Heating Bed"
+                elif nozzle_target > 0 and abs(nozzle_curr - nozzle_target) > 5:
+                    state = "Heating Nozzle"
+
+            result = {
+                'filename': print_info.get('Filename', ''),
+                'print_duration': print_info.get('CurrentTicks', 0),
+                'total_duration': print_info.get('TotalTicks', 0),
+                'state': state,
+                'progress': 0,
+                'layer': print_info.get('CurrentLayer'),
+                'total_layers': print_info.get('TotalLayer'),
+                'meta': status_data,
+                'temps': {
+                    'bed': (status_data.get('TempOfHotbed', 0), status_data.get('TempTargetHotbed', 0)),
+                    'nozzle': (status_data.get('TempOfNozzle', 0), status_data.get('TempTargetNozzle', 0)),
+                    'chamber': status_data.get('TempOfCase', 0) # 'TempOfCase' is common for Chamber
+                }
+            }
+
+            # Clear stats if Idle to prevent stale data
+            if state == "Idle":
+                result['progress'] = 0
+                result['print_duration'] = 0
+                result['total_duration'] = 0
+
+            if result['total_duration'] > 0:
+                result['progress'] = result['print_duration'] / result['total_duration']
+            elif print_info.get('TotalLayer', 0) > 0:
+                result['progress'] = print_info.get('CurrentLayer', 0) / print_info.get('TotalLayer')
+            else:
+                # Fallback to raw progress if nothing else works (e.g. at start)
+                raw_prog = print_info.get('Progress', 0)
+                if raw_prog > 0:
+                    result['progress'] = raw_prog / 100.0
+
+            # Force 100% if Complete
+            if state == "Complete":
+                result['progress'] = 1.0
+                if result['total_duration'] > 0:
+                    result['print_duration'] = result['total_duration']
+
+            return result
+        return None
@@ -0,0 +1,54 @@
+import asyncio
+import aiohttp
+import logging
+
+logger = logging.getLogger("SnapshotPoller")
+
+class SnapshotPoller:
+    """
+    Fetches still images from a camera snapshot URL (e.g. ?action=snapshot).
+
+    Each poll is a conditional GET using the ETag / Last-Modified validators of
+    the previous response, so an unchanged image is not downloaded again.
+    """
+    def __init__(self, url):
+        self.url = url
+        self.etag = None
+        self.last_modified = None
+
+    async def poll(self, session, slot):
+        """
+        Fetches the current snapshot into `slot`. Returns True if a new image was stored.
+        """
+        headers = {}
+        if self.etag:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified:
+            headers['If-Modified-Since'] = self.last_modified
+
+        try:
+            timeout = aiohttp.ClientTimeout(total=10)
+            async with session.get(self.url, headers=headers, timeout=timeout) as response:
+                if response.status == 304:
+                    # Unchanged, the slot still holds the current image
+                    slot.set_online()
+                    return False
+
+                if response.status != 200:
+                    logger.error(f"Snapshot request failed {self.url}: {response.status}")
+                    slot.set_offline()
+                    return False
+
+                data = await response.read()
+                self.etag = response.headers.get('ETag')
+                self.last_modified = response.headers.get('Last-Modified')
+                slot.put(data)
+                return True
+
+        except (asyncio.TimeoutError, aiohttp.ClientError) as e:
+            logger.error(f"Snapshot connection error {self.url}: {e}")
+        except Exception as e:
+            logger.error(f"Unexpected snapshot error {self.url}: {e}")
+
+        slot.set_offline()
+        return False
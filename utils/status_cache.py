@@ -0,0 +1,89 @@
+import asyncio
+import logging
+import time
+
+logger = logging.getLogger("StatusCache")
+
+class PrinterStatusCache:
+    """
+    Polls each watched printer in its own task and keeps its latest status.
+
+    Streams only read the cache, so a slow or hung printer never holds up a
+    camera, and streams that show the same printer share a single poll.
+    A status older than `ttl` seconds is treated as missing.
+    """
+    def __init__(self, fetch, interval=3.0, ttl=30.0, timeout=10.0, on_status=None, on_release=None):
+        self.fetch = fetch          # async fetch(printer_url) -> status dict ({} on failure)
+        self.on_status = on_status  # Optional on_status(printer_url, status) for every fresh status
+        self.on_release = on_release # Optional on_release(printer_url) once no stream watches it
+        self.interval = interval
+        self.ttl = ttl
+        self.timeout = timeout
+        self.entries = {}           # printer_url -> (status, time.monotonic())
+        self._watchers = {}         # printer_url -> number of streams using it
+        self._tasks = {}
+
+    def watch(self, printer_url):
+        """
+        Registers a stream that shows `printer_url`, starting its poller if needed.
+        """
+        self._watchers[printer_url] = self._watchers.get(printer_url, 0) + 1
+        task = self._tasks.get(printer_url)
+        if task is None or task.done():
+            self._tasks[printer_url] = asyncio.create_task(self._collect(printer_url))
+
+    def unwatch(self, printer_url):
+        """
+        Unregisters a stream; the poller stops once no stream uses the printer.
+        """
+        count = self._watchers.get(printer_url, 0) - 1
+        if count > 0:
+            self._watchers[printer_url] = count
+            return
+        self._watchers.pop(printer_url, None)
+        self.entries.pop(printer_url, None)
+        task = self._tasks.pop(printer_url, None)
+        if task:
+            task.cancel()
+        if self.on_release:
+            self.on_release(printer_url)
+
+    def watched(self):
+        """
+        Returns the printer URLs at least one stream is watching.
+        """
+        return list(self._watchers)
+
+    def get(self, printer_url):
+        """
+        Returns the cached status of `printer_url`, or {} if there is none or it is too old.
+        """
+        entry = self.entries.get(printer_url)
+        if entry and time.monotonic() - entry[1] <= self.ttl:
+            return entry[0]
+        return {}
+
+    async def close(self):
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._tasks = {}
+        self._watchers = {}
+        self.entries = {}
+
+    async def _collect(self, printer_url):
+        while True:
+            try:
+                status = await asyncio.wait_for(self.fetch(printer_url), timeout=self.timeout)
+                if status:
+                    self.entries[printer_url] = (status, time.monotonic())
+                    if self.on_status:
+                        self.on_status(printer_url, status)
+            except asyncio.CancelledError:
+                raise
+            except asyncio.TimeoutError:
+                logger.warning(f"Printer status for {printer_url} timed out after {self.timeout}s")
+            except Exception as e:
+                logger.error(f"Printer status collector error for {printer_url}: {e}")
+            await asyncio.sleep(self.interval)
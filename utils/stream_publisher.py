@@ -0,0 +1,110 @@
+import hashlib
+import json
+import time
+
+from utils.edit_scheduler import EditScheduler
+
+class BotPublisher:
+    """
+    Posts stream messages as the bot itself. All of them share the channel's
+    edit rate limit, so edits go through the bot-wide scheduler.
+    """
+    def __init__(self, channel, bot_user, scheduler):
+        self.channel = channel
+        self.bot_user = bot_user
+        self.scheduler = scheduler
+
+    def owns(self, message):
+        return message.author == self.bot_user and message.webhook_id is None
+
+    async def adopt(self, message):
+        return message
+
+    async def send(self, **kwargs):
+        return await self.channel.send(**kwargs)
+
+    async def close(self):
+        pass
+
+class WebhookPublisher:
+    """
+    Posts a stream's message through its own channel webhook. Webhook edits
+    have their own rate-limit bucket, so each webhook gets its own scheduler.
+    """
+    def __init__(self, webhook, username=None):
+        self.webhook = webhook
+        self.username = username
+        self.scheduler = EditScheduler(rate=5, per=2.0)
+        self.scheduler.start()
+
+    def owns(self, message):
+        return message.webhook_id == self.webhook.id
+
+    async def adopt(self, message):
+        # WebhookMessage.edit() goes through the webhook instead of the bot
+        return await self.webhook.fetch_message(message.id)
+
+    async def send(self, **kwargs):
+        return await self.webhook.send(username=self.username, wait=True, **kwargs)
+
+    async def close(self):
+        await self.scheduler.stop()
+
+def embed_state(embeds):
+    """
+    Serializes what the embeds show right now. Embeds keep changing while an edit
+    is in flight, so this is taken before the edit is awaited.
+    """
+    parts = []
+    for embed in embeds:
+        data = embed.to_dict()
+        # The timestamp is refreshed on every edit, so it doesn't count as a change
+        data.pop('timestamp', None)
+        parts.append(data)
+    return json.dumps(parts, sort_keys=True, default=str)
+
+def render_fingerprint(state, attachment_id=None):
+    """
+    Hash of what a message visibly shows: its embed_state() plus the ID of its image attachment.
+    """
+    raw = json.dumps([state, attachment_id])
+    return hashlib.md5(raw.encode()).hexdigest()
+
+async def edit_rendered(message, rendered, embeds, **kwargs):
+    """
+    Edits `message` to show `embeds` and records the edit in `rendered`. Returns
+    the edited message.
+    """
+    state = embed_state(embeds)
+    message = await message.edit(embeds=embeds, **kwargs)
+    rendered.sent(render_fingerprint(state, attachment_id(message)))
+    return message
+
+def attachment_id(message):
+    if message and message.attachments:
+        return message.attachments[0].id
+    return None
+
+class RenderedState:
+    """
+    Remembers the fingerprint of the last edit of a message so edits that change
+    nothing can be skipped. One edit every `heartbeat` seconds still goes through
+    so the footer timestamp shows the bot is alive (0 disables the heartbeat).
+    """
+    def __init__(self, heartbeat=60):
+        self.heartbeat = heartbeat
+        self.fingerprint = None
+        self.sent_at = None
+
+    def reset(self):
+        self.fingerprint = None
+        self.sent_at = None
+
+    def needs_edit(self, fingerprint):
+        if fingerprint != self.fingerprint or self.sent_at is None:
+            return True
+        return bool(self.heartbeat) and time.monotonic() - self.sent_at >= self.heartbeat
+
+    def sent(self, fingerprint):
+        self.fingerprint = fingerprint
+        self.sent_at = time.monotonic()
@@ -0,0 +1,132 @@
+import collections
+import json
+import logging
+import os
+import time
+
+logger = logging.getLogger("Timelapse")
+
+class TimelapseRecorder:
+    """
+    Records a print as a ring buffer of JPEG files on disk.
+
+    A frame is taken whenever the printer reports a new layer, or every
+    `interval` seconds for printers that don't report layers. Once more than
+    `max_frames` frames or `max_bytes` bytes are stored, the oldest frames are
+    deleted, so disk and memory use stay constant however long the print runs.
+    The buffer survives restarts of the bot.
+
+    File operations block; call add(), start() and clear() from an executor.
+    """
+    META_FILE = "timelapse.json"
+
+    def __init__(self, directory, interval=60, max_frames=300, max_bytes=30 * 1024 * 1024):
+        self.directory = directory
+        self.interval = interval
+        self.max_frames = max_frames
+        self.max_bytes = max_bytes
+        self.frames = collections.deque() # (path, size, caption), oldest first
+        self.total_bytes = 0
+        self.filename = None   # Print file being recorded, None when idle
+        self._next_index = 0
+        self._last_layer = None
+        self._last_sample = 0
+        self._load()
+
+    @property
+    def recording(self):
+        return self.filename is not None
+
+    def start(self, filename):
+        """
+        Starts recording a print. Frames of the same file left over from before
+        a restart are kept; anything else is discarded.
+        """
+        if self.filename == filename:
+            return
+        self.clear()
+        self.filename = filename
+        self._save_meta()
+
+    def should_sample(self, layer=None):
+        """
+        Returns True if a frame should be added now, for a printer at `layer` (or None).
+        """
+        if not self.recording:
+            return False
+        if layer is not None:
+            return layer != self._last_layer
+        return time.monotonic() - self._last_sample >= self.interval
+
+    def add(self, jpg_data, layer=None):
+        path = os.path.join(self.directory, f"frame_{self._next_index:06d}.jpg")
+        with open(path, 'wb') as f:
+            f.write(jpg_data)
+        caption = f"Layer {layer}" if layer is not None else time.strftime("%H:%M")
+        self.frames.append((path, len(jpg_data), caption))
+        self.total_bytes += len(jpg_data)
+        self._next_index += 1
+        self._last_layer = layer
+        self._last_sample = time.monotonic()
+
+        while self.frames and (len(self.frames) > self.max_frames or self.total_bytes > self.max_bytes):
+            old_path, size, _ = self.frames.popleft()
+            self.total_bytes -= size
+            self._remove(old_path)
+        self._save_meta()
+
+    def clear(self):
+        for path, _, _ in self.frames:
+            self._remove(path)
+        self.frames.clear()
+        self.total_bytes = 0
+        self.filename = None
+        self._last_layer = None
+        self._last_sample = 0
+        self._remove(os.path.join(self.directory, self.META_FILE))
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.error(f"Failed to delete {path}: {e}")
+
+    def _save_meta(self):
+        meta = {
+            'filename': self.filename,
+            'next_index': self._next_index,
+            'captions': {os.path.basename(path): caption for path, _, caption in self.frames}
+        }
+        tmp_file = os.path.join(self.directory, self.META_FILE + ".tmp")
+        with open(tmp_file, 'w') as f:
+            json.dump(meta, f)
+        os.replace(tmp_file, os.path.join(self.directory, self.META_FILE))
+
+    def _load(self):
+        os.makedirs(self.directory, exist_ok=True)
+        meta = {}
+        try:
+            with open(os.path.join(self.directory, self.META_FILE), 'r') as f:
+                meta = json.load(f)
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.error(f"Failed to load timelapse state in {self.directory}: {e}")
+
+        captions = meta.get('captions', {})
+        for name in sorted(os.listdir(self.directory)):
+            if not name.endswith(".jpg"):
+                continue
+            path = os.path.join(self.directory, name)
+            if name not in captions:
+                # Not part of the recorded print (e.g. written while the meta file was lost)
+                self._remove(path)
+                continue
+            size = os.path.getsize(path)
+            self.frames.append((path, size, captions[name]))
+            self.total_bytes += size
+
+        self.filename = meta.get('filename') if self.frames else None
+        self._next_index = meta.get('next_index', 0)